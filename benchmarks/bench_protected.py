@@ -0,0 +1,61 @@
+"""Microbenchmark for the per-request overhead of the `Protected` dependency.
+
+Usage:
+
+    python benchmarks/bench_protected.py [--roles 100] [--permissions 300]
+"""
+
+import argparse
+import timeit
+
+from starlette.requests import Request
+
+from fastapi_auth.auth_config import AUTH_SETTINGS
+from fastapi_auth.dependencies import Protected
+from fastapi_auth.permissions import Permission
+from fastapi_auth.roles import Role
+from fastapi_auth.users import User
+
+
+def make_user(num_roles: int, num_permissions: int) -> tuple[User, list[Role], list[Permission]]:
+    permissions = [Permission(name=f"perm{i}", description=f"Permission {i}") for i in range(num_permissions)]
+    roles = [
+        Role(name=f"role{i}", description=f"Role {i}", permissions=permissions[i::num_roles]) for i in range(num_roles)
+    ]
+    user = User(name="bench", description="bench", is_anonymous=False, roles=roles)
+    return user, roles, permissions
+
+
+def bench(label: str, func, number: int) -> None:
+    seconds = min(timeit.repeat(func, number=number, repeat=5))
+    print(f"{label:<50} {seconds / number * 1e6:8.2f} µs/call")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--roles", type=int, default=100)
+    parser.add_argument("--permissions", type=int, default=300)
+    parser.add_argument("--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    user, roles, permissions = make_user(args.roles, args.permissions)
+    request = Request({"type": "http", "headers": []})
+
+    by_role = Protected(required_roles=[roles[-1]])
+    by_permission = Protected(required_permission=permissions[-1])
+    denied = Permission(name="missing", description="Not granted")
+
+    print(f"user with {args.roles} roles, {args.permissions} permissions")
+    bench("Protected(required_roles=...)", lambda: by_role(request, user), args.number)
+    bench("Protected(required_permission=...)", lambda: by_permission(request, user), args.number)
+    bench("User.has_permission() (granted)", lambda: user.has_permission(permissions[-1]), args.number)
+    bench("User.has_permission() (denied)", lambda: user.has_permission(denied), args.number)
+
+    AUTH_SETTINGS.debug_typecheck = True
+    bench("Protected(required_roles=...), typechecked", lambda: by_role(request, user), args.number)
+    bench("Protected(required_permission=...), typechecked", lambda: by_permission(request, user), args.number)
+    AUTH_SETTINGS.debug_typecheck = False
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""Compare size and decode cost of full and compact session payloads.
+
+The session cookie is encoded like Starlette's `SessionMiddleware` does
+(JSON, base64, signed with itsdangerous), then decoded and turned back into
+a `User` as `get_user` does on a cache miss.
+
+Usage:
+
+    python benchmarks/bench_session_payload.py [--roles 20] [--permissions 50]
+"""
+
+import argparse
+import json
+import timeit
+from base64 import b64decode, b64encode
+
+from itsdangerous import TimestampSigner
+
+from fastapi_auth.permissions import Permission
+from fastapi_auth.roles import ROLES_REGISTRY, Role
+from fastapi_auth.users import User
+
+
+def encode(signer: TimestampSigner, session: dict) -> bytes:
+    return signer.sign(b64encode(json.dumps(session).encode("utf-8")))
+
+
+def decode(signer: TimestampSigner, cookie: bytes) -> dict:
+    return json.loads(b64decode(signer.unsign(cookie, max_age=3600)))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--roles", type=int, default=20)
+    parser.add_argument("--permissions", type=int, default=50)
+    parser.add_argument("--number", type=int, default=2000)
+    args = parser.parse_args()
+
+    permissions = [Permission(name=f"perm{i}", description=f"Permission number {i}") for i in range(args.permissions)]
+    roles = [Role(name=f"role{i}", description=f"Role number {i}", permissions=permissions) for i in range(args.roles)]
+    for role in roles:
+        ROLES_REGISTRY.register(role)
+    user = User(
+        name="bench",
+        description="bench",
+        is_anonymous=False,
+        roles=roles,
+        properties={"source": "internal", "logged_in": "2024-01-01T00:00:00", "expires": "2024-01-02T00:00:00"},
+    )
+    signer = TimestampSigner("secret_key")
+
+    print(f"user with {args.roles} roles of {args.permissions} permissions each")
+    for label, payload, loader in [
+        ("full (model_dump)", user.model_dump(), lambda p: User(**p)),
+        ("compact (session_payload)", user.session_payload(), User.from_session_payload),
+    ]:
+        cookie = encode(signer, {"user": payload})
+
+        def decode_user(loader=loader, cookie=cookie):
+            return loader(decode(signer, cookie)["user"])
+
+        seconds = min(timeit.repeat(decode_user, number=args.number, repeat=5))
+        print(f"{label:<28} {len(cookie):8d} bytes {seconds / args.number * 1e6:10.2f} µs/decode")
+
+
+if __name__ == "__main__":
+    main()
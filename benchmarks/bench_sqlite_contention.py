@@ -0,0 +1,96 @@
+"""Measure user lookups per second on SQLite with concurrent writes, with and
+without the SQLite tuning profile (`AUTH_SQLITE_TUNING`).
+
+Several reader processes (like uvicorn workers handling logins) look up users
+while one writer process keeps changing roles. Without tuning, readers wait
+for the rollback journal lock (or fail with "database is locked").
+
+Usage:
+
+    python benchmarks/bench_sqlite_contention.py [--readers 4] [--seconds 3] [--users 1000]
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy.exc import OperationalError
+
+from fastapi_auth.auth_config import AUTH_SETTINGS
+from fastapi_auth.engines import dispose_engines
+from fastapi_auth.user_management_sqlobject import UserManagement, dummy_hash
+
+
+def reader(db_uri: str, users: int, deadline: float, results) -> None:
+    um = UserManagement(db_uri)
+    lookups = errors = 0
+    while time.time() < deadline:
+        try:
+            um.has_user(f"user{random.randrange(users)}")
+            lookups += 1
+        except OperationalError:
+            errors += 1
+    results.put(("reader", lookups, errors))
+
+
+def writer(db_uri: str, users: int, deadline: float, results) -> None:
+    um = UserManagement(db_uri)
+    writes = errors = 0
+    while time.time() < deadline:
+        try:
+            um.set_roles_many({f"user{random.randrange(users)}": random.choice(["User", "User,Editor"])})
+            writes += 1
+        except OperationalError:
+            errors += 1
+    results.put(("writer", writes, errors))
+
+
+def run(db_uri: str, args) -> tuple[int, int, int]:
+    """Return the number of lookups, writes and errors."""
+    # children create their own engines
+    dispose_engines()
+    results = multiprocessing.Queue()
+    deadline = time.time() + args.seconds
+    processes = [
+        multiprocessing.Process(target=reader, args=(db_uri, args.users, deadline, results))
+        for _ in range(args.readers)
+    ]
+    processes.append(multiprocessing.Process(target=writer, args=(db_uri, args.users, deadline, results)))
+    for process in processes:
+        process.start()
+    counts = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    lookups = sum(count for kind, count, _ in counts if kind == "reader")
+    writes = sum(count for kind, count, _ in counts if kind == "writer")
+    errors = sum(error for _, _, error in counts)
+    return lookups, writes, errors
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--users", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for tuning in (False, True):
+            AUTH_SETTINGS.sqlite_tuning = tuning
+            db_uri = f"sqlite:///{os.path.join(tmp, f'users_{tuning}.db')}"
+            UserManagement(db_uri).add_hashed_users(
+                [{"username": f"user{i}", "password": dummy_hash(), "roles": "User"} for i in range(args.users)]
+            )
+            lookups, writes, errors = run(db_uri, args)
+            print(
+                f"tuning={tuning!s:5} {lookups / args.seconds:8.0f} lookups/s "
+                f"{writes / args.seconds:6.0f} writes/s ({args.readers} readers, 1 writer, "
+                f"{errors} 'database is locked' errors)"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Compare the throughput of adding users one by one and of the bulk import.
+
+"one by one" is what `fastapi-auth-user-admin add` does per user (existence
+check, serial hashing, one transaction per user). "bulk" is the path of the
+`import` command: hashing in a process pool and one transaction per batch.
+
+Usage:
+
+    python benchmarks/bench_user_import.py [--users 500] [--rounds 10] [--workers 4]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from fastapi_auth import password_hashers
+from fastapi_auth.engines import dispose_engine
+from fastapi_auth.password_hashers import BcryptHasher
+from fastapi_auth.user_cmd import hash_users
+from fastapi_auth.user_management_sqlobject import UserManagement
+
+
+def records(count: int, offset: int = 0):
+    for i in range(offset, offset + count):
+        yield {"username": f"user{i}", "roles": "User", "password": f"password{i}", "password_hash": None}
+
+
+def one_by_one(um: UserManagement, count: int) -> None:
+    for record in records(count):
+        um.add_user(record["username"], record["password"], record["roles"])
+
+
+def bulk(um: UserManagement, count: int, batch_size: int, workers: int) -> None:
+    it = records(count)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while batch := list(islice(it, batch_size)):
+            um.add_hashed_users(hash_users(batch, executor))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--rounds", type=int, default=10, help="bcrypt rounds")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    password_hashers._PASSWORD_HASHER = BcryptHasher(rounds=args.rounds)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, func in (
+            ("one by one", lambda um: one_by_one(um, args.users)),
+            ("bulk", lambda um: bulk(um, args.users, args.batch_size, args.workers)),
+        ):
+            db_uri = f"sqlite:///{os.path.join(tmp, name.replace(' ', '_'))}.db"
+            um = UserManagement(db_uri)
+            start = time.perf_counter()
+            func(um)
+            elapsed = time.perf_counter() - start
+            assert len(um.get_users()) == args.users
+            dispose_engine(db_uri)
+            print(f"{name:12s} {args.users} users in {elapsed:7.2f} s  ({args.users / elapsed:8.1f} users/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""Benchmark suite for the authentication and authorization hot paths.
+
+Every benchmark reports the best time per call of several runs and is compared
+with the stored baseline in `baselines.json`; the runner exits with status 1
+if a benchmark is slower than its baseline by more than `--tolerance`
+(default: twice as slow, timings of sub-microsecond benchmarks vary by tens
+of percent between runs). Baselines depend on the machine, store them where
+the suite runs:
+
+    python benchmarks/run_benchmarks.py             # compare with the baselines
+    python benchmarks/run_benchmarks.py --save      # store new baselines
+    python benchmarks/run_benchmarks.py -k protected
+    python benchmarks/run_benchmarks.py -k import     # startup time
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+from collections.abc import Callable
+from pathlib import Path
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+BASELINES = BENCHMARKS_DIR / "baselines.json"
+
+# temporary directory for the benchmark databases, set by __main__
+TMP = ""
+
+# name -> function returning (callable to time, number of calls per run)
+BENCHMARKS: dict[str, Callable[[], tuple[Callable[[], object], int]]] = {}
+
+
+def benchmark(name: str):
+    """Register a benchmark setup function under `name`."""
+
+    def decorator(setup):
+        BENCHMARKS[name] = setup
+        return setup
+
+    return decorator
+
+
+def make_user(num_roles: int, num_permissions: int):
+    from fastapi_auth.permissions import Permission
+    from fastapi_auth.roles import Role
+    from fastapi_auth.users import User
+
+    permissions = [Permission(name=f"perm{i}", description=f"Permission {i}") for i in range(num_permissions)]
+    roles = [
+        Role(name=f"role{i}", description=f"Role {i}", permissions=permissions[i::num_roles]) for i in range(num_roles)
+    ]
+    return User(name="bench", description="bench", is_anonymous=False, roles=roles), roles, permissions
+
+
+def _protected(num_roles: int, num_permissions: int, by: str):
+    from starlette.requests import Request
+
+    from fastapi_auth.dependencies import Protected
+
+    user, roles, permissions = make_user(num_roles, num_permissions)
+    request = Request({"type": "http", "headers": []})
+    if by == "role":
+        protected = Protected(required_roles=[roles[-1]])
+    else:
+        protected = Protected(required_permission=permissions[-1])
+    return lambda: protected(request, user), 200000
+
+
+for _roles, _permissions in ((1, 3), (10, 30), (100, 300)):
+    for _by in ("role", "permission"):
+        benchmark(f"protected_{_by}_{_roles}_roles_{_permissions}_permissions")(
+            lambda r=_roles, p=_permissions, b=_by: _protected(r, p, b)
+        )
+
+
+@benchmark("has_permission")
+def has_permission():
+    user, _, permissions = make_user(10, 30)
+    return lambda: user.has_permission(permissions[-1]), 20000
+
+
+def _get_user(cached: bool):
+    from starlette.requests import Request
+
+    from fastapi_auth.dependencies import USER_CACHE, get_user
+    from fastapi_auth.roles import ROLES_REGISTRY
+
+    user, roles, _ = make_user(10, 30)
+    for role in roles:
+        ROLES_REGISTRY.register(role)
+    session = {"user": user.session_payload()}
+
+    def func():
+        if not cached:
+            USER_CACHE.clear()
+        return get_user(Request({"type": "http", "headers": [], "session": session}))
+
+    return func, 5000
+
+
+@benchmark("get_user_session_cached")
+def get_user_cached():
+    return _get_user(cached=True)
+
+
+@benchmark("get_user_session_decode")
+def get_user_decode():
+    return _get_user(cached=False)
+
+
+def _database(tmp: str, name: str) -> str:
+    from fastapi_auth import password_hashers
+    from fastapi_auth.password_hashers import BcryptHasher
+
+    # cheap hashes, the benchmarks measure everything but bcrypt
+    password_hashers._PASSWORD_HASHER = BcryptHasher(rounds=4)
+    return f"sqlite:///{os.path.join(tmp, name)}.db"
+
+
+@benchmark("login_roundtrip")
+def login_roundtrip():
+    from fastapi.testclient import TestClient
+
+    from fastapi_auth.auth_config import AUTH_SETTINGS
+    from fastapi_auth.user_management_sqlobject import UserManagement
+
+    AUTH_SETTINGS.db_uri = _database(TMP, "login")
+    UserManagement(AUTH_SETTINGS.db_uri).add_user("admin", "admin", "Administrator")
+    # the demo app mounts its static files relative to the working directory
+    os.chdir(BENCHMARKS_DIR.parent)
+    from fastapi_auth.demo_app import app
+
+    client = TestClient(app)
+
+    def func():
+        response = client.post("/auth/login", data={"username": "admin", "password": "admin"})
+        assert "now logged in" in response.text
+        client.get("/auth/logout")
+
+    return func, 50
+
+
+def _users(prefix: str, count: int) -> list[dict]:
+    from fastapi_auth.user_management_sqlobject import dummy_hash
+
+    return [{"username": f"{prefix}{i:06d}", "password": dummy_hash(), "roles": "User,Editor"} for i in range(count)]
+
+
+@benchmark("bulk_add_1000_users")
+def bulk_add():
+    from fastapi_auth.user_management_sqlobject import UserManagement
+
+    um = UserManagement(_database(TMP, "bulk_add"))
+    batches = iter(range(1_000_000))
+    return lambda: um.add_hashed_users(_users(f"batch{next(batches)}_", 1000)), 3
+
+
+@benchmark("iter_1000_users")
+def iter_users():
+    from fastapi_auth.user_management_sqlobject import UserManagement
+
+    um = UserManagement(_database(TMP, "iter"))
+    um.add_hashed_users(_users("user", 1000))
+    return lambda: sum(1 for _ in um.iter_users(batch_size=250)), 5
+
+
+@benchmark("set_roles_1000_users")
+def set_roles():
+    from fastapi_auth.user_management_sqlobject import UserManagement
+
+    um = UserManagement(_database(TMP, "roles"))
+    users = _users("user", 1000)
+    um.add_hashed_users(users)
+    roles = {user["username"]: "User" for user in users}
+    return lambda: um.set_roles_many(roles), 3
+
+
+@benchmark("users_with_role")
+def users_with_role():
+    from fastapi_auth.user_management_sqlobject import UserManagement
+
+    um = UserManagement(_database(TMP, "with_role"))
+    um.add_hashed_users(_users("user", 1000))
+    return lambda: um.users_with_role("Editor"), 50
+
+
+def _import(module: str):
+    # a fresh interpreter per run, like a CLI invocation or a worker boot
+    command = [sys.executable, "-c", f"import {module}"]
+    return lambda: subprocess.run(command, check=True), 1
+
+
+@benchmark("import_user_cmd")
+def import_user_cmd():
+    return _import("fastapi_auth.user_cmd")
+
+
+@benchmark("import_auth_routes")
+def import_auth_routes():
+    return _import("fastapi_auth.auth_routes")
+
+
+def run(name: str, repeat: int) -> float:
+    """Return the best time per call of benchmark `name` in microseconds."""
+    func, number = BENCHMARKS[name]()
+    func()  # warm up caches and lazy imports
+    return min(timeit.repeat(func, number=number, repeat=repeat, timer=time.perf_counter)) / number * 1e6
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-k", dest="pattern", default="", help="Only run benchmarks containing this string")
+    parser.add_argument("--save", action="store_true", help="Store the results as new baselines")
+    parser.add_argument("--tolerance", type=float, default=1.0, help="Allowed slowdown (1.0 = twice as slow)")
+    parser.add_argument("--repeat", type=int, default=7)
+    args = parser.parse_args()
+
+    from loguru import logger
+
+    # keep console logging out of the measurements
+    logger.remove(0)
+
+    baselines = json.loads(BASELINES.read_text()) if BASELINES.exists() else {}
+    results = {}
+    regressions = []
+    for name in BENCHMARKS:
+        if args.pattern not in name:
+            continue
+        results[name] = result = run(name, args.repeat)
+        baseline = baselines.get(name)
+        if baseline is None:
+            status = "no baseline"
+        else:
+            ratio = result / baseline
+            status = f"{ratio:5.2f}x baseline"
+            if ratio > 1 + args.tolerance:
+                status += "  REGRESSION"
+                regressions.append(name)
+        print(f"{name:<50} {result:12.2f} µs/call  {status}")
+
+    if args.save:
+        baselines.update(results)
+        BASELINES.write_text(json.dumps(baselines, indent=2, sort_keys=True) + "\n")
+        print(f"Stored baselines in {BASELINES}")
+        return 0
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) slower than the baseline: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as TMP:
+        sys.exit(main())
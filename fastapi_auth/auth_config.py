@@ -11,6 +11,103 @@ class AuthConfig(BaseSettings):
     log_filename: str = "fastpi_auth.log"
     always_superuser: bool = False
 
+    # level of the log file; repeated "permission denied" messages per route
+    # and user are limited to log_sample_burst per log_sample_interval
+    # seconds (0 disables sampling)
+    log_level: str = "INFO"
+    log_sample_burst: int = 10
+    log_sample_interval: float = 60.0
+    # replace loguru's default (synchronous) stderr handler by a queued one
+    log_queue_stderr: bool = False
+
+    # record metrics and serve them at /auth/metrics (see metrics.py)
+    metrics_enabled: bool = False
+
+    # where session data is kept: "cookie" (signed cookie), "memory" or "sql"
+    # (server-side, see session_store.py)
+    session_backend: str = "cookie"
+    session_ttl: int = 3600 * 24
+    session_cache_size: int = 10000
+
+    # issue bearer tokens at /auth/token and accept them in get_user; tokens
+    # are not revoked by password changes or deletions of users
+    tokens_enabled: bool = False
+
+    # bearer tokens (see tokens.py): HS256 tokens are signed with
+    # token_secret_key (default: secret_key), EdDSA tokens with an Ed25519
+    # key pair (PEM)
+    token_algorithm: str = "HS256"
+    token_secret_key: SecretStr | None = None
+    token_private_key: SecretStr | None = None
+    token_public_key: str | None = None
+    token_lifetime: int = 3600
+    token_cache_size: int = 1024
+
+    # number of users parsed from session cookies kept in memory
+    user_cache_size: int = 1024
+
+    # type check Protected() at runtime for every request (slow, for debugging)
+    debug_typecheck: bool = False
+
+    # use AsyncUserManagement for logins; the async URI is derived from
+    # db_uri unless async_db_uri is set
+    async_db: bool = False
+    async_db_uri: str | None = None
+
+    # connection pool of the user database
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_pre_ping: bool = False
+    db_pool_recycle: int = -1
+
+    # PRAGMAs applied to every new SQLite connection if sqlite_tuning is set
+    # (busy_timeout in milliseconds, mmap_size in bytes, cache_size in pages
+    # or, if negative, in KiB)
+    sqlite_tuning: bool = False
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_busy_timeout: int = 5000
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    sqlite_cache_size: int = -64000
+
+    # how the AUTHENTICATOR_REGISTRY runs authenticators: "sequential" or
+    # "concurrent", with a timeout (seconds) per authenticator
+    authenticator_mode: str = "sequential"
+    authenticator_timeout: float | None = None
+    # skip an authenticator for a cool-down period (seconds) after a number
+    # of consecutive errors (0 disables the circuit breaker)
+    authenticator_breaker_threshold: int = 5
+    authenticator_breaker_cooldown: float = 30.0
+
+    # login attempts allowed per username and per client IP within
+    # login_rate_limit_window seconds (0 disables rate limiting); buckets
+    # are kept in "memory" or in the "sql" database (shared by all workers)
+    login_rate_limit: int = 0
+    login_rate_limit_window: float = 60.0
+    login_rate_limit_backend: str = "memory"
+    login_rate_limit_cache_size: int = 10000
+
+    # negative cache of unknown usernames (entries expire after ttl seconds)
+    negative_cache_size: int = 10000
+    negative_cache_ttl: float = 60.0
+
+    # cache successful password checks for credential_cache_ttl seconds
+    # (0 disables the cache)
+    credential_cache_ttl: float = 0
+    credential_cache_size: int = 1024
+
+    # password hashing of new passwords: "bcrypt" or "argon2" (extra "argon2");
+    # hashes with another algorithm or cost are replaced on successful logins
+    password_hasher: str = "bcrypt"
+    bcrypt_rounds: int = 12
+    argon2_time_cost: int = 3
+    argon2_memory_cost: int = 65536
+    argon2_parallelism: int = 4
+
+    # worker pool for password hashing/verification
+    hash_workers: int = 4
+    hash_queue_size: int = 64
+
     class Config:
         env_prefix = "AUTH_"
 
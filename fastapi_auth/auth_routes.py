@@ -1,7 +1,8 @@
 from typing import Optional
 
 from fastapi import Depends, Request, APIRouter
-from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.exceptions import HTTPException
+from fastapi.responses import HTMLResponse, PlainTextResponse, RedirectResponse
 from starlette import status
 
 from .dependencies import get_user
@@ -9,14 +10,25 @@ from .logger import LOG
 from .users import User, ANONYMOUS_USER, SUPER_USER
 from .roles import ROLES_REGISTRY
 from .user_management_sqlobject import authenticate_user_for_fastapi
-from .jinja2_templates import templates
+from .jinja2_templates import get_templates
 
 from starlette.middleware.sessions import SessionMiddleware
 
+from .session_store import (
+    MemorySessionStore,
+    ServerSideSessionMiddleware,
+    SessionStore,
+    SQLSessionStore,
+    register_session_store,
+)
+
 
 from .auth_config import AUTH_SETTINGS
 
 from .authenticator_registry import AUTHENTICATOR_REGISTRY
+from .tokens import get_token_signer
+from .rate_limit import check_login_rate_limit
+from .metrics import METRICS_REGISTRY
 
 LIFE_TIME = 3600 * 24
 
@@ -24,8 +36,31 @@ LIFE_TIME = 3600 * 24
 router = APIRouter()
 
 
-def install_middleware(app):
-    app.add_middleware(SessionMiddleware, secret_key=AUTH_SETTINGS.secret_key.get_secret_value())
+def make_session_store() -> SessionStore | None:
+    """Return the session store configured by `AUTH_SETTINGS.session_backend`
+    (None for cookie-based sessions)."""
+    backend = AUTH_SETTINGS.session_backend
+    if backend == "cookie":
+        return None
+    if backend == "memory":
+        return MemorySessionStore(ttl=AUTH_SETTINGS.session_ttl, maxsize=AUTH_SETTINGS.session_cache_size)
+    if backend == "sql":
+        return SQLSessionStore(ttl=AUTH_SETTINGS.session_ttl, db_uri=AUTH_SETTINGS.db_uri)
+    raise ValueError(f"Unknown session backend {backend}")
+
+
+def install_middleware(app, session_store: SessionStore | None = None):
+    """Install the session middleware. Sessions are kept in `session_store` if
+    given (e.g. a `RedisSessionStore`), otherwise as configured by
+    `AUTH_SETTINGS.session_backend`."""
+    if session_store is None:
+        session_store = make_session_store()
+    if session_store is None:
+        app.add_middleware(SessionMiddleware, secret_key=AUTH_SETTINGS.secret_key.get_secret_value())
+    else:
+        # password changes and deletions of users revoke their sessions
+        register_session_store(session_store)
+        app.add_middleware(ServerSideSessionMiddleware, store=session_store)
 
 
 @router.get("/login", response_class=HTMLResponse)
@@ -35,7 +70,7 @@ async def login(
     message: Optional[str] = None,
     error_message: Optional[str] = None,
 ):
-    return templates.TemplateResponse(
+    return get_templates().TemplateResponse(
         request,
         "login.html",
         {
@@ -56,6 +91,32 @@ async def logout(
     return RedirectResponse(url=f"/?message={message}")
 
 
+@router.get("/metrics")
+async def metrics():
+    """Metrics in the Prometheus text format (only if `AUTH_SETTINGS.metrics_enabled`)."""
+    if not AUTH_SETTINGS.metrics_enabled:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    return PlainTextResponse(METRICS_REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@router.post("/token")
+async def token_post(request: Request):
+    """Issue a bearer token for API clients, see `tokens.py`."""
+    if not AUTH_SETTINGS.tokens_enabled:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    await check_login_rate_limit(request)
+    user = await AUTHENTICATOR_REGISTRY.authenticate(request)
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    signer = get_token_signer()
+    LOG.info("Issued token for user {}", user.name)
+    return {"access_token": signer.issue(user), "token_type": "bearer", "expires_in": signer.lifetime}
+
+
 @router.post("/login")
 async def login_post(
     request: Request,
@@ -64,28 +125,20 @@ async def login_post(
         SUPER_USER.roles = ROLES_REGISTRY.all_roles()
         authenticate_user_for_fastapi(user=SUPER_USER, request=request)
         message = "You are now logged in as superuser."
-        LOG.info(f"User {SUPER_USER.name} logged in")
+        LOG.info("User {} logged in", SUPER_USER.name)
         return RedirectResponse(f"/?message={message}", status_code=status.HTTP_302_FOUND)
 
-    for authenticator in AUTHENTICATOR_REGISTRY.authenticators:
-        LOG.debug(f"Trying to authenticate with {authenticator.name}")
-        try:
-            user = await authenticator.authenticate(request)
-        except Exception as e:  # pragma: no cover
-            LOG.error(f"Error authenticating with {authenticator.name}: {e}")
-            user = None
-        if user:
-            break
-
+    await check_login_rate_limit(request)
+    user = await AUTHENTICATOR_REGISTRY.authenticate(request)
     if user:
         authenticate_user_for_fastapi(user=user, request=request)
         message = f"Welcome {user.name}. You are now logged in."
-        LOG.info(f"User {user.name} logged in")
+        LOG.info("User {} logged in", user.name)
         return RedirectResponse(f"/?message={message}", status_code=status.HTTP_302_FOUND)
 
     else:
         message = "You could not be logged in. Please try again."
-        return templates.TemplateResponse(
+        return get_templates().TemplateResponse(
             request,
             "login.html",
             {
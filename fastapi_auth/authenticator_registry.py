@@ -1,9 +1,15 @@
+import asyncio
+import time
 from abc import ABC, abstractmethod
 
+from .auth_config import AUTH_SETTINGS
+from .logger import LOG
+from .metrics import AUTHENTICATOR_SECONDS, LOGIN_ATTEMPTS
 from .users import User
 
 from fastapi import Request
-from typeguard import typechecked
+from fastapi.exceptions import HTTPException
+from .typechecking import typechecked
 
 
 class Authenticator(ABC):
@@ -17,16 +23,164 @@ class Authenticator(ABC):
         raise NotImplementedError()  # pragma: no cover
 
 
+class AuthenticatorStats:
+    """Health statistics and circuit breaker state of an authenticator.
+
+    `failures` counts calls not returning a user, `errors` calls raising an
+    exception or timing out.
+    """
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.successes = 0
+        self.failures = 0
+        self.errors = 0
+        self.skipped = 0
+        self.total_latency = 0.0
+        self.consecutive_errors = 0
+        self.open_until = 0.0
+
+    def is_open(self, now: float) -> bool:
+        """Check if the circuit breaker is open, i.e. the authenticator is skipped."""
+        return now < self.open_until
+
+    def as_dict(self) -> dict:
+        """Return the statistics as a dictionary."""
+        return {
+            "calls": self.calls,
+            "successes": self.successes,
+            "failures": self.failures,
+            "errors": self.errors,
+            "skipped": self.skipped,
+            "error_rate": self.errors / self.calls if self.calls else 0.0,
+            "average_latency": self.total_latency / self.calls if self.calls else 0.0,
+            "circuit_open": self.is_open(time.monotonic()),
+        }
+
+
 class AuthenticatorRegistry:
-    """Registry for authenticators."""
+    """Registry for authenticators.
+
+    In "sequential" mode, authenticators are tried one after another in the
+    order of their position. In "concurrent" mode, all authenticators run at
+    the same time; the first one returning a user wins and the others are
+    cancelled. In both modes, an authenticator taking longer than its timeout
+    counts as failed. `mode` and `timeout` default to
+    `AUTH_SETTINGS.authenticator_mode` and `AUTH_SETTINGS.authenticator_timeout`.
+
+    After `AUTH_SETTINGS.authenticator_breaker_threshold` consecutive errors
+    (exceptions or timeouts), an authenticator is skipped for
+    `AUTH_SETTINGS.authenticator_breaker_cooldown` seconds. The next call after
+    the cool-down is a trial: another error opens the circuit again.
+    """
 
-    def __init__(self):
+    def __init__(self, mode: str | None = None, timeout: float | None = None):
         self.authenticators = []
+        self.timeouts = {}
+        self.stats = {}
+        self.mode = mode
+        self.timeout = timeout
 
     @typechecked
-    def add_authenticator(self, authenticator: Authenticator, position: int) -> None:
-        """Add an authenticator to the registry."""
+    def add_authenticator(self, authenticator: Authenticator, position: int, timeout: float | None = None) -> None:
+        """Add an authenticator to the registry. `timeout` (seconds) overrides
+        the default timeout of the registry for this authenticator."""
         self.authenticators.insert(position, authenticator)
+        if timeout is not None:
+            self.timeouts[authenticator] = timeout
+
+    def get_timeout(self, authenticator: Authenticator) -> float | None:
+        """Return the timeout for `authenticator` (None for no timeout)."""
+        timeout = self.timeouts.get(authenticator)
+        if timeout is None:
+            timeout = self.timeout if self.timeout is not None else AUTH_SETTINGS.authenticator_timeout
+        return timeout
+
+    def get_stats(self) -> dict[str, dict]:
+        """Return the statistics of all authenticators, keyed by name."""
+        return {
+            authenticator.name: self.stats.setdefault(authenticator, AuthenticatorStats()).as_dict()
+            for authenticator in self.authenticators
+        }
+
+    async def _authenticate_with(self, authenticator: Authenticator, request: Request) -> User | None:
+        stats = self.stats.setdefault(authenticator, AuthenticatorStats())
+        start = time.monotonic()
+        if stats.is_open(start):
+            stats.skipped += 1
+            LOGIN_ATTEMPTS.inc(authenticator=authenticator.name, result="skipped")
+            return None
+
+        LOG.debug("Trying to authenticate with {}", authenticator.name)
+        try:
+            user = await asyncio.wait_for(authenticator.authenticate(request), self.get_timeout(authenticator))
+        except HTTPException:
+            # e.g. 503 from a saturated hashing pool
+            raise
+        except asyncio.TimeoutError:  # noqa: UP041 - not the builtin TimeoutError before Python 3.11
+            LOG.error("Timeout authenticating with {}", authenticator.name)
+        except Exception as e:  # noqa: BLE001 - a failing authenticator must not break the login
+            LOG.error("Error authenticating with {}: {}", authenticator.name, e)
+        else:
+            latency = time.monotonic() - start
+            stats.calls += 1
+            stats.total_latency += latency
+            stats.consecutive_errors = 0
+            if user:
+                stats.successes += 1
+            else:
+                stats.failures += 1
+            LOGIN_ATTEMPTS.inc(authenticator=authenticator.name, result="success" if user else "failure")
+            AUTHENTICATOR_SECONDS.observe(latency, authenticator=authenticator.name)
+            return user
+
+        now = time.monotonic()
+        stats.calls += 1
+        stats.errors += 1
+        stats.total_latency += now - start
+        LOGIN_ATTEMPTS.inc(authenticator=authenticator.name, result="error")
+        AUTHENTICATOR_SECONDS.observe(now - start, authenticator=authenticator.name)
+        stats.consecutive_errors += 1
+        threshold = AUTH_SETTINGS.authenticator_breaker_threshold
+        if threshold and stats.consecutive_errors >= threshold:
+            stats.open_until = now + AUTH_SETTINGS.authenticator_breaker_cooldown
+            LOG.warning(
+                "Authenticator {} failed {} times, skipping it for {} seconds",
+                authenticator.name,
+                stats.consecutive_errors,
+                AUTH_SETTINGS.authenticator_breaker_cooldown,
+            )
+        return None
+
+    async def authenticate(self, request: Request) -> User | None:
+        """Return the user authenticated by the registered authenticators, or None."""
+        mode = self.mode or AUTH_SETTINGS.authenticator_mode
+        if mode == "sequential":
+            for authenticator in self.authenticators:
+                user = await self._authenticate_with(authenticator, request)
+                if user:
+                    return user
+            return None
+        if mode == "concurrent":
+            return await self._authenticate_concurrently(request)
+        raise ValueError(f"Unknown authenticator mode {mode}")
+
+    async def _authenticate_concurrently(self, request: Request) -> User | None:
+        # parse the form once, the authenticators then share the cached form
+        await request.form()
+        tasks = [
+            asyncio.ensure_future(self._authenticate_with(authenticator, request))
+            for authenticator in self.authenticators
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                user = await next_done
+                if user:
+                    return user
+            return None
+        finally:
+            for task in tasks:
+                task.cancel()
 
 
 AUTHENTICATOR_REGISTRY = AuthenticatorRegistry()
@@ -9,7 +9,7 @@ from starlette.responses import HTMLResponse
 from .auth_routes import router as auth_router, install_middleware
 from .dependencies import get_user
 from .users import User
-from .jinja2_templates import templates
+from .jinja2_templates import get_templates
 from .roles import ROLES_REGISTRY, Role
 from .permissions import Permission
 from .dependencies import Protected
@@ -81,7 +81,7 @@ def read_root(
     message: Optional[str] = None,
     error_message: Optional[str] = None,
 ):
-    return templates.TemplateResponse(
+    return get_templates().TemplateResponse(
         request,
         "demo.html",
         {
@@ -1,27 +1,73 @@
+import json
+
 from fastapi import Request, Depends
 from typing import Optional, Callable
 from fastapi.exceptions import HTTPException
-from typeguard import typechecked
+from .typechecking import typechecked
 
 # from .user import User, get_user, Unauthorized
 
 from .users import User, ANONYMOUS_USER
 from .roles import Role
-from .permissions import Permission
-from .logger import LOG
+from .permissions import Permission, permission_bit
+from .logger import DENIAL_SAMPLER, LOG
+from .auth_config import AUTH_SETTINGS
+from .cache import LRUCache
+from .metrics import PROTECTED_CHECKS, SESSION_DECODE_SECONDS
+from .tokens import InvalidToken, bearer_token, get_token_signer
 
 
 class Unauthorized(Exception):
     """ """
 
 
+# users parsed from session payloads, keyed by the serialized payload
+USER_CACHE = LRUCache(maxsize=AUTH_SETTINGS.user_cache_size)
+
+
 def get_user(request: Request) -> User:
     """This dependency return either an authenticated user depending on the
-    presented token or an anonymous user if no token is presented."""
+    presented token or an anonymous user if no token is presented.
+
+    The user is taken from the session or, for requests without a logged in
+    session and if `AUTH_SETTINGS.tokens_enabled` is set, from a bearer token
+    in the `Authorization` header.
+
+    The user is resolved once per request (memoized on `request.state`), and
+    users are shared between requests carrying the same session payload, so
+    treat the returned user as read-only.
+    """
+
+    user = getattr(request.state, "auth_user", None)
+    if user is not None:
+        return user
 
     if "user" not in request.session:
-        return ANONYMOUS_USER
-    return User(**request.session["user"])
+        user = ANONYMOUS_USER
+        token = bearer_token(request) if AUTH_SETTINGS.tokens_enabled else None
+        if token is not None:
+            try:
+                user = get_token_signer().user_from_token(token)
+            except InvalidToken:
+                pass
+    else:
+        with SESSION_DECODE_SECONDS.time():
+            fingerprint = json.dumps(request.session["user"], sort_keys=True, separators=(",", ":"))
+            user = USER_CACHE.get(fingerprint)
+            if user is None:
+                user = User.from_session_payload(request.session["user"])
+                USER_CACHE.set(fingerprint, user)
+
+    request.state.auth_user = user
+    return user
+
+
+def route_path(request: Request | None) -> str:
+    """Return the path template of the route of `request` (e.g. `/items/{id}`)."""
+    if request is None:
+        return ""
+    route = request.scope.get("route")
+    return getattr(route, "path", None) or request.url.path
 
 
 class Protected:
@@ -53,27 +99,50 @@ class Protected:
         self.required_roles = required_roles
         self.required_checker = required_checker
 
-    @typechecked
+        # requirements compiled for the per-request check
+        self.required_role_names = frozenset(role.name for role in required_roles)
+        self.required_permission_bit = permission_bit(required_permission) if required_permission else 0
+
     def __call__(
         self,
         request: Request,
         user: User = Depends(get_user),
     ) -> User:
-        # check for roles
-        for rr in self.required_roles:
-            for user_role in user.roles:
-                if user_role == rr:
-                    return user
-
-        # If the user has the required permission, return the user
-        if self.required_permission:
-            if user.has_permission(self.required_permission):
-                return user
-
-        if self.required_checker:
-            if self.required_checker(user=user, request=request):
-                return user
-
-        msg = f"Permission denied for user {user}. Required roles: {self.required_roles}, required permission: {self.required_permission}. Required checker: {self.required_checker}. User has role {user.roles}"
-        LOG.error(msg)
-        raise HTTPException(status_code=403, detail=msg)
+        if AUTH_SETTINGS.debug_typecheck:
+            return self._typechecked_check(request, user)
+        return self.check(request, user)
+
+    def check(self, request: Request, user: User) -> User:
+        """Return `user` if it meets the requirements, raise a 403 otherwise."""
+
+        allowed = (
+            # one of the required roles
+            not self.required_role_names.isdisjoint(user.role_name_set)
+            # the required permission
+            or user.permission_mask & self.required_permission_bit
+            or (self.required_checker is not None and self.required_checker(user=user, request=request))
+        )
+        if AUTH_SETTINGS.metrics_enabled:
+            PROTECTED_CHECKS.inc(route=route_path(request), result="allow" if allowed else "deny")
+        if allowed:
+            return user
+
+        path = request.url.path if request is not None else None
+        dropped = DENIAL_SAMPLER.allow((path, user.name))
+        if dropped is not None:
+            # only names are formatted, and only if the message is logged at all
+            LOG.error(
+                "Permission denied for user {} on {}. Required roles: {}, required permission: {}, "
+                "required checker: {}. User has roles: {}{}",
+                user.name,
+                path,
+                sorted(self.required_role_names),
+                self.required_permission.name if self.required_permission else None,
+                self.required_checker is not None,
+                sorted(user.role_name_set),
+                f" ({dropped} similar messages suppressed)" if dropped else "",
+            )
+        raise HTTPException(status_code=403, detail=f"Permission denied for user {user.name}.")
+
+    # check() with runtime type checking, see AuthConfig.debug_typecheck
+    _typechecked_check = typechecked(check)
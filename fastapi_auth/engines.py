@@ -0,0 +1,107 @@
+"""Process-wide registry of database engines, keyed by database URI."""
+
+import threading
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+from sqlmodel import SQLModel, create_engine
+
+from .auth_config import AUTH_SETTINGS
+from .logger import LOG
+from .typechecking import typechecked
+
+_ENGINES: dict[str, Engine] = {}
+_LOCK = threading.Lock()
+
+
+def _is_memory_db(db_uri: str) -> bool:
+    url = make_url(db_uri)
+    return url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")
+
+
+@typechecked
+def engine_options(db_uri: str) -> dict:
+    """Return the `create_engine()` options for `db_uri` based on `AUTH_SETTINGS`."""
+    options: dict = {
+        "pool_pre_ping": AUTH_SETTINGS.db_pool_pre_ping,
+        "pool_recycle": AUTH_SETTINGS.db_pool_recycle,
+    }
+    # in-memory SQLite uses a single shared connection, sizing does not apply
+    if not _is_memory_db(db_uri):
+        options.update(
+            pool_size=AUTH_SETTINGS.db_pool_size,
+            max_overflow=AUTH_SETTINGS.db_max_overflow,
+        )
+    return options
+
+
+_SQLITE_JOURNAL_MODES = ("DELETE", "TRUNCATE", "PERSIST", "MEMORY", "WAL", "OFF")
+_SQLITE_SYNCHRONOUS = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+
+def sqlite_pragmas() -> list[str]:
+    """Return the PRAGMA statements of the SQLite tuning configured by `AUTH_SETTINGS`."""
+    journal_mode = AUTH_SETTINGS.sqlite_journal_mode.upper()
+    if journal_mode not in _SQLITE_JOURNAL_MODES:
+        raise ValueError(f"Unknown SQLite journal mode {AUTH_SETTINGS.sqlite_journal_mode}")
+    synchronous = AUTH_SETTINGS.sqlite_synchronous.upper()
+    if synchronous not in _SQLITE_SYNCHRONOUS:
+        raise ValueError(f"Unknown SQLite synchronous setting {AUTH_SETTINGS.sqlite_synchronous}")
+    return [
+        f"PRAGMA journal_mode={journal_mode}",
+        f"PRAGMA synchronous={synchronous}",
+        f"PRAGMA busy_timeout={AUTH_SETTINGS.sqlite_busy_timeout:d}",
+        f"PRAGMA mmap_size={AUTH_SETTINGS.sqlite_mmap_size:d}",
+        f"PRAGMA cache_size={AUTH_SETTINGS.sqlite_cache_size:d}",
+    ]
+
+
+def apply_sqlite_tuning(engine: Engine) -> None:
+    """Run the `sqlite_pragmas()` on every new connection of `engine`
+    (for async engines, pass `engine.sync_engine`)."""
+    pragmas = sqlite_pragmas()
+
+    @event.listens_for(engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma in pragmas:
+            cursor.execute(pragma)
+        cursor.close()
+
+
+@typechecked
+def get_engine(db_uri: str) -> Engine:
+    """Return the shared engine for `db_uri`.
+
+    The engine (and its connection pool) is created on first use and the
+    schema is created once at that point. Later calls return the same engine.
+    SQLite connections are tuned if `AUTH_SETTINGS.sqlite_tuning` is set.
+    """
+    engine = _ENGINES.get(db_uri)
+    if engine is not None:
+        return engine
+    with _LOCK:
+        engine = _ENGINES.get(db_uri)
+        if engine is None:
+            LOG.info("Connecting to database {}", db_uri)
+            engine = create_engine(db_uri, **engine_options(db_uri))
+            if AUTH_SETTINGS.sqlite_tuning and engine.dialect.name == "sqlite":
+                apply_sqlite_tuning(engine)
+            SQLModel.metadata.create_all(engine)
+            _ENGINES[db_uri] = engine
+    return engine
+
+
+@typechecked
+def dispose_engine(db_uri: str) -> None:
+    """Close all pooled connections of `db_uri` and forget its engine."""
+    with _LOCK:
+        engine = _ENGINES.pop(db_uri, None)
+    if engine is not None:
+        engine.dispose()
+
+
+def dispose_engines() -> None:
+    """Dispose all registered engines (e.g. on application shutdown)."""
+    for db_uri in list(_ENGINES):
+        dispose_engine(db_uri)
@@ -1,15 +1,29 @@
-"""Jinja2 templates for FastAPI."""
+"""Jinja2 templates for FastAPI.
 
-from fastapi.templating import Jinja2Templates
-from jinja2 import Environment, PackageLoader
+The template environment is created on first use, not at import time.
+"""
 
+from functools import cache
 
-env = Environment(
-    loader=PackageLoader(
-        "fastapi_auth",
-        "templates",
-    ),
-    autoescape=True,
-)
 
-templates = Jinja2Templates(env=env)
+@cache
+def get_templates():
+    """Return the (shared) `Jinja2Templates` of the package templates."""
+    from fastapi.templating import Jinja2Templates
+    from jinja2 import Environment, PackageLoader
+
+    env = Environment(
+        loader=PackageLoader(
+            "fastapi_auth",
+            "templates",
+        ),
+        autoescape=True,
+    )
+    return Jinja2Templates(env=env)
+
+
+def __getattr__(name: str):
+    # `from fastapi_auth.jinja2_templates import templates` keeps working
+    if name == "templates":
+        return get_templates()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,9 +1,91 @@
-from loguru import logger as LOG  # noqa
+import sys
+import threading
+import time
+from collections.abc import Hashable
+
+from loguru import logger
 
 from .auth_config import AUTH_SETTINGS
+from .cache import LRUCache
+
+
+class LazyLogger:
+    """The loguru logger, adding the log file sink on first use.
+
+    Importing the package does not open the log file; CLI invocations that
+    never log do not touch it at all.
+    """
+
+    def __init__(self) -> None:
+        self._configured = False
+        self._lock = threading.Lock()
+
+    def configure(self):
+        """Add the log file sink (once) and return the loguru logger.
+
+        The application's handlers are left alone unless
+        `AUTH_SETTINGS.log_queue_stderr` is set: then loguru's default
+        stderr handler is replaced by a queued one using
+        `AUTH_SETTINGS.log_level`.
+        """
+        if not self._configured:
+            with self._lock:
+                if not self._configured:
+                    # messages are written by a background thread (enqueue),
+                    # not on the event loop
+                    if AUTH_SETTINGS.log_queue_stderr:
+                        try:
+                            logger.remove(0)
+                        except ValueError:
+                            pass
+                        else:
+                            logger.add(sys.stderr, level=AUTH_SETTINGS.log_level, enqueue=True)
+                    logger.add(
+                        AUTH_SETTINGS.log_filename, level=AUTH_SETTINGS.log_level, retention="10 days", enqueue=True
+                    )
+                    self._configured = True
+        return logger
+
+    def __getattr__(self, name: str):
+        # only called for attributes not cached yet: later calls of LOG.info
+        # etc. go straight to the bound loguru method
+        attr = getattr(self.configure(), name)
+        setattr(self, name, attr)
+        return attr
+
+
+LOG = LazyLogger()
+
+
+class LogSampler:
+    """Rate limit repetitive log messages.
+
+    Per key, the first `burst` messages of every `interval` seconds are let
+    through, further ones are dropped and counted. A `burst` of 0 disables
+    sampling.
+    """
+
+    def __init__(self, burst: int, interval: float, maxsize: int = 10000) -> None:
+        self.burst = burst
+        self.interval = interval
+        self.windows = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+
+    def allow(self, key: Hashable) -> int | None:
+        """Return None if a message for `key` should be dropped, otherwise the
+        number of messages dropped for `key` in the previous interval."""
+        if self.burst <= 0:
+            return 0
+        now = time.monotonic()
+        with self._lock:
+            window = self.windows.get(key)
+            if window is None or now - window[0] >= self.interval:
+                dropped = max(0, window[1] - self.burst) if window is not None else 0
+                self.windows.set(key, [now, 1])
+                return dropped
+            window[1] += 1
+            return 0 if window[1] <= self.burst else None
+
 
-LOG.add(
-    AUTH_SETTINGS.log_filename,
-    level="DEBUG",
-    retention="10 days",
-)
+# sampler for "permission denied" messages, keyed by route and user
+DENIAL_SAMPLER = LogSampler(burst=AUTH_SETTINGS.log_sample_burst, interval=AUTH_SETTINGS.log_sample_interval)
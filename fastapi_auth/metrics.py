@@ -0,0 +1,202 @@
+"""Counters and latency histograms of the authentication hot paths.
+
+Metrics are only recorded if `AUTH_SETTINGS.metrics_enabled` is set and are
+served in the Prometheus text format by `/auth/metrics`. No client library
+is needed.
+"""
+
+import bisect
+import threading
+import time
+from collections.abc import Iterable
+
+from .auth_config import AUTH_SETTINGS
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(names: Iterable[str], values: Iterable[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_number(value: float) -> str:
+    return str(int(value)) if value == int(value) else repr(value)
+
+
+class Metric:
+    """Base class of metrics with a name, a help text and label names."""
+
+    type: str = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._values: dict[tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> tuple[str, ...]:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name} requires the labels {', '.join(self.labelnames)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def clear(self) -> None:
+        """Forget all recorded values."""
+        with self._lock:
+            self._values.clear()
+
+    def samples(self) -> list[str]:
+        """Return the sample lines of the text format."""
+        raise NotImplementedError()  # pragma: no cover
+
+    def render(self) -> str:
+        """Return the metric in the Prometheus text format."""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        return "\n".join(lines + self.samples()) + "\n"
+
+
+class Counter(Metric):
+    """A monotonically increasing value per label combination."""
+
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        """Increase the counter of `labels` by `amount`."""
+        if not AUTH_SETTINGS.metrics_enabled:
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        """Return the counter of `labels`."""
+        return self._values.get(self._key(labels), 0.0)
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            values = sorted(self._values.items())
+        return [f"{self.name}{_labels(self.labelnames, key)} {_format_number(value)}" for key, value in values]
+
+
+class _Timer:
+    def __init__(self, histogram: "Histogram", labels: dict) -> None:
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self) -> "_Timer":  # noqa: PYI034 - typing.Self needs Python 3.11
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+
+
+class Histogram(Metric):
+    """Observed values (e.g. latencies in seconds) counted in cumulative buckets."""
+
+    type = "histogram"
+
+    DEFAULT_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: str) -> None:
+        """Record `value` for `labels`."""
+        if not AUTH_SETTINGS.metrics_enabled:
+            return
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # counts per bucket (the last one is +Inf), sum
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            state[0][index] += 1
+            state[1] += value
+
+    def time(self, **labels: str) -> _Timer:
+        """Return a context manager observing the time spent in its block."""
+        return _Timer(self, labels)
+
+    def count(self, **labels: str) -> int:
+        """Return the number of observations of `labels`."""
+        state = self._values.get(self._key(labels))
+        return sum(state[0]) if state else 0
+
+    def samples(self) -> list[str]:
+        with self._lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        lines = []
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_format_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together."""
+
+    def __init__(self) -> None:
+        self.metrics: list[Metric] = []
+
+    def register(self, metric: Metric) -> Metric:
+        """Add `metric` to the registry and return it."""
+        self.metrics.append(metric)
+        return metric
+
+    def clear(self) -> None:
+        """Forget the recorded values of all metrics."""
+        for metric in self.metrics:
+            metric.clear()
+
+    def render(self) -> str:
+        """Return all metrics in the Prometheus text format."""
+        return "".join(metric.render() for metric in self.metrics)
+
+
+METRICS_REGISTRY = MetricsRegistry()
+
+LOGIN_ATTEMPTS = METRICS_REGISTRY.register(
+    Counter(
+        "fastapi_auth_login_attempts_total",
+        "Authentication attempts per authenticator and result (success, failure, error, skipped).",
+        ("authenticator", "result"),
+    )
+)
+AUTHENTICATOR_SECONDS = METRICS_REGISTRY.register(
+    Histogram("fastapi_auth_authenticator_seconds", "Time spent in an authenticator.", ("authenticator",))
+)
+PASSWORD_VERIFY_SECONDS = METRICS_REGISTRY.register(
+    Histogram("fastapi_auth_password_verify_seconds", "Time to verify a password hash.", ("algorithm",))
+)
+DB_LOOKUP_SECONDS = METRICS_REGISTRY.register(
+    Histogram("fastapi_auth_db_lookup_seconds", "Time to look up a user in the database.")
+)
+SESSION_DECODE_SECONDS = METRICS_REGISTRY.register(
+    Histogram("fastapi_auth_session_decode_seconds", "Time to resolve the user of a session.")
+)
+PROTECTED_CHECKS = METRICS_REGISTRY.register(
+    Counter(
+        "fastapi_auth_protected_checks_total",
+        "Protected checks per route and result (allow, deny).",
+        ("route", "result"),
+    )
+)
@@ -0,0 +1,146 @@
+"""Pluggable password hashers (bcrypt, argon2).
+
+New passwords are hashed with the hasher configured by `AUTH_SETTINGS`.
+Stored hashes of any supported algorithm can still be verified; hashes of
+another algorithm or cost are reported by `needs_rehash()`, so they can be
+replaced on the next successful login.
+"""
+
+from abc import ABC, abstractmethod
+from functools import cached_property
+
+import bcrypt
+
+from .auth_config import AUTH_SETTINGS
+from .typechecking import typechecked
+
+
+class PasswordHasher(ABC):
+    """Abstract base class for password hashers."""
+
+    name: str = "PasswordHasher"
+
+    @abstractmethod
+    def hash(self, password: str) -> str:
+        """Return the hash of `password`."""
+        raise NotImplementedError()  # pragma: no cover
+
+    @abstractmethod
+    def verify(self, password: str, hashed_password: str) -> bool:
+        """Check `password` against `hashed_password`."""
+        raise NotImplementedError()  # pragma: no cover
+
+    @abstractmethod
+    def identifies(self, hashed_password: str) -> bool:
+        """Check if `hashed_password` was created by this kind of hasher."""
+        raise NotImplementedError()  # pragma: no cover
+
+    @abstractmethod
+    def needs_rehash(self, hashed_password: str) -> bool:
+        """Check if `hashed_password` should be replaced by a hash of this hasher."""
+        raise NotImplementedError()  # pragma: no cover
+
+    @cached_property
+    def dummy_hash(self) -> str:
+        """A hash checked for unknown users, so that their logins take as long
+        as those of existing users."""
+        return self.hash("dummy password")
+
+
+class BcryptHasher(PasswordHasher):
+    """bcrypt with a cost of `rounds` (2**rounds iterations)."""
+
+    name = "bcrypt"
+
+    @typechecked
+    def __init__(self, rounds: int = 12) -> None:
+        if not 4 <= rounds <= 31:
+            raise ValueError("bcrypt rounds must be between 4 and 31")
+        self.rounds = rounds
+
+    def hash(self, password: str) -> str:
+        return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=self.rounds)).decode()
+
+    def verify(self, password: str, hashed_password: str) -> bool:
+        return bcrypt.checkpw(password.encode(), hashed_password.encode())
+
+    def identifies(self, hashed_password: str) -> bool:
+        return hashed_password.startswith("$2")
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        if not self.identifies(hashed_password):
+            return True
+        # $2b$<rounds>$<salt and hash>
+        return hashed_password.split("$")[2] != f"{self.rounds:02d}"
+
+
+class Argon2Hasher(PasswordHasher):
+    """argon2id, requires the `argon2-cffi` package (extra `argon2`).
+
+    `memory_cost` is given in KiB.
+    """
+
+    name = "argon2"
+
+    @typechecked
+    def __init__(self, time_cost: int = 3, memory_cost: int = 65536, parallelism: int = 4) -> None:
+        # argon2-cffi is only needed for argon2 hashes
+        import argon2
+
+        self._hasher = argon2.PasswordHasher(time_cost=time_cost, memory_cost=memory_cost, parallelism=parallelism)
+        self._verify_errors = (argon2.exceptions.VerificationError, argon2.exceptions.InvalidHashError)
+
+    def hash(self, password: str) -> str:
+        return self._hasher.hash(password)
+
+    def verify(self, password: str, hashed_password: str) -> bool:
+        try:
+            return self._hasher.verify(hashed_password, password)
+        except self._verify_errors:
+            return False
+
+    def identifies(self, hashed_password: str) -> bool:
+        return hashed_password.startswith("$argon2")
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        if not self.identifies(hashed_password):
+            return True
+        return self._hasher.check_needs_rehash(hashed_password)
+
+
+_PASSWORD_HASHER: PasswordHasher | None = None
+_VERIFIERS: dict[str, PasswordHasher] = {}
+
+
+@typechecked
+def make_password_hasher(name: str) -> PasswordHasher:
+    """Return a hasher for the algorithm `name` with the cost configured by `AUTH_SETTINGS`."""
+    if name == "bcrypt":
+        return BcryptHasher(rounds=AUTH_SETTINGS.bcrypt_rounds)
+    if name == "argon2":
+        return Argon2Hasher(
+            time_cost=AUTH_SETTINGS.argon2_time_cost,
+            memory_cost=AUTH_SETTINGS.argon2_memory_cost,
+            parallelism=AUTH_SETTINGS.argon2_parallelism,
+        )
+    raise ValueError(f"Unknown password hasher {name}")
+
+
+def get_password_hasher() -> PasswordHasher:
+    """Return the password hasher configured by `AUTH_SETTINGS`, created on first use."""
+    global _PASSWORD_HASHER
+    if _PASSWORD_HASHER is None:
+        _PASSWORD_HASHER = make_password_hasher(AUTH_SETTINGS.password_hasher)
+    return _PASSWORD_HASHER
+
+
+def get_verifier(hashed_password: str) -> PasswordHasher:
+    """Return a hasher able to verify `hashed_password`."""
+    hasher = get_password_hasher()
+    if hasher.identifies(hashed_password):
+        return hasher
+    name = "argon2" if hashed_password.startswith("$argon2") else "bcrypt"
+    verifier = _VERIFIERS.get(name)
+    if verifier is None:
+        verifier = _VERIFIERS.setdefault(name, make_password_hasher(name))
+    return verifier
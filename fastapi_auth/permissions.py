@@ -1,10 +1,69 @@
 """This module contains the Permission model."""
 
-from pydantic import BaseModel, Field
+import threading
+import weakref
+from collections.abc import Iterable
+
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class Permission(BaseModel):
-    """A permission model."""
+    """A permission model (immutable and hashable)."""
+
+    model_config = ConfigDict(frozen=True)
 
     name: str = Field(..., description="Name of the permission")
     description: str = Field(..., description="Description of the permission")
+
+    def __eq__(self, other: object) -> bool:
+        # interned permissions are compared by identity
+        return self is other or super().__eq__(other)
+
+    def __hash__(self) -> int:
+        return hash((self.name, self.description))
+
+
+# canonical instance of every distinct permission in use, see
+# intern_permission(); entries go away with the last role referring to them
+_PERMISSIONS: weakref.WeakValueDictionary[tuple[str, str], Permission] = weakref.WeakValueDictionary()
+
+# Every distinct permission is interned to a single bit, see permission_bit().
+# Bits are process-wide so that masks computed by different registries are
+# comparable, and they are never reassigned. The table therefore grows with
+# every distinct permission (name and description) seen by the process; it is
+# meant for the permissions defined by the application, not for permissions
+# created from user input.
+_PERMISSION_BITS: dict[tuple[str, str], int] = {}
+_LOCK = threading.Lock()
+
+
+def intern_permission(permission: Permission) -> Permission:
+    """Return the canonical instance of `permission`.
+
+    Equal permissions interned this way are the same object, so comparing them
+    is an identity check.
+    """
+    key = (permission.name, permission.description)
+    with _LOCK:
+        interned = _PERMISSIONS.get(key)
+        if interned is None:
+            _PERMISSIONS[key] = interned = permission
+    return interned
+
+
+def permission_bit(permission: Permission) -> int:
+    """Return the bit interned for `permission`."""
+    key = (permission.name, permission.description)
+    bit = _PERMISSION_BITS.get(key)
+    if bit is None:
+        with _LOCK:
+            bit = _PERMISSION_BITS.setdefault(key, 1 << len(_PERMISSION_BITS))
+    return bit
+
+
+def permissions_mask(permissions: Iterable[Permission]) -> int:
+    """Return the bitmask of all `permissions`."""
+    mask = 0
+    for permission in permissions:
+        mask |= permission_bit(permission)
+    return mask
@@ -0,0 +1,213 @@
+"""Rate limiting of login attempts (token buckets per username and client IP).
+
+Login attempts are checked before any password hashing happens, so a
+credential-stuffing burst is rejected cheaply with HTTP 429.
+"""
+
+import threading
+import time
+from abc import ABC, abstractmethod
+
+from fastapi import Request
+from fastapi.exceptions import HTTPException
+from sqlalchemy import case, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Field, Session, SQLModel
+from starlette import status
+from starlette.concurrency import run_in_threadpool
+
+from .auth_config import AUTH_SETTINGS
+from .cache import LRUCache
+from .engines import get_engine
+from .typechecking import typechecked
+
+
+class RateLimitExceeded(HTTPException):
+    """Raised when there are too many attempts."""
+
+    def __init__(self, retry_after: float) -> None:
+        super().__init__(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many login attempts. Please try again later.",
+            headers={"Retry-After": str(max(1, round(retry_after)))},
+        )
+
+
+class RateLimitBackend(ABC):
+    """Abstract base class for token bucket storage."""
+
+    @abstractmethod
+    async def consume(self, key: str, capacity: int, refill_rate: float) -> float:
+        """Take one token from the bucket `key`.
+
+        Return 0 if a token was available, otherwise the number of seconds
+        until the next token becomes available.
+        """
+        raise NotImplementedError()  # pragma: no cover
+
+
+def _refill(tokens: float, updated: float, now: float, capacity: int, refill_rate: float) -> float:
+    return min(capacity, tokens + (now - updated) * refill_rate)
+
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    """Token buckets in process memory (the `maxsize` most recent keys)."""
+
+    @typechecked
+    def __init__(self, maxsize: int = 10000) -> None:
+        self.buckets = LRUCache(maxsize=maxsize)
+        self._lock = threading.Lock()
+
+    async def consume(self, key: str, capacity: int, refill_rate: float) -> float:
+        now = time.monotonic()
+        with self._lock:
+            bucket = self.buckets.get(key)
+            tokens = capacity if bucket is None else _refill(*bucket, now, capacity, refill_rate)
+            if tokens < 1:
+                return (1 - tokens) / refill_rate
+            self.buckets.set(key, (tokens - 1, now))
+        return 0
+
+
+class RateLimitBucket(SQLModel, table=True):
+    __tablename__ = "auth_rate_limit"
+
+    key: str = Field(primary_key=True)
+    tokens: float
+    updated: float
+
+
+# dialects supporting INSERT ... ON CONFLICT DO UPDATE ... WHERE ... RETURNING
+_UPSERT_DIALECTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+class SQLRateLimitBackend(RateLimitBackend):
+    """Token buckets in a SQL database, shared between worker processes.
+
+    On SQLite and PostgreSQL a token is taken by a single atomic upsert
+    statement, concurrent attempts (also of other processes) cannot take the
+    same token. Other databases lock the bucket row (`SELECT ... FOR UPDATE`)
+    and retry if another attempt created the bucket concurrently.
+
+    Database calls run in Starlette's thread pool.
+    """
+
+    @typechecked
+    def __init__(self, db_uri: str) -> None:
+        self.engine = get_engine(db_uri)
+        SQLModel.metadata.create_all(self.engine, tables=[RateLimitBucket.__table__])
+
+    def _consume(self, key: str, capacity: int, refill_rate: float) -> float:
+        now = time.time()
+        insert = _UPSERT_DIALECTS.get(self.engine.dialect.name)
+        if insert is None:
+            return self._consume_locked(key, capacity, refill_rate, now)
+
+        table = RateLimitBucket.__table__
+        elapsed = case((table.c.updated < now, now - table.c.updated), else_=0)
+        refilled = case(
+            (table.c.tokens + elapsed * refill_rate > capacity, capacity),
+            else_=table.c.tokens + elapsed * refill_rate,
+        )
+        # the update (and RETURNING) only happens if a token is available
+        statement = (
+            insert(table)
+            .values(key=key, tokens=capacity - 1, updated=now)
+            .on_conflict_do_update(
+                index_elements=[table.c.key],
+                set_={"tokens": refilled - 1, "updated": now},
+                where=refilled >= 1,
+            )
+            .returning(table.c.tokens)
+        )
+        with self.engine.begin() as connection:
+            if connection.execute(statement).first() is not None:
+                return 0
+            tokens, updated = connection.execute(
+                select(table.c.tokens, table.c.updated).where(table.c.key == key)
+            ).one()
+        return (1 - _refill(tokens, updated, now, capacity, refill_rate)) / refill_rate
+
+    def _consume_locked(self, key: str, capacity: int, refill_rate: float, now: float) -> float:
+        while True:
+            try:
+                with Session(self.engine) as session:
+                    bucket = session.get(RateLimitBucket, key, with_for_update=True)
+                    if bucket is None:
+                        bucket = RateLimitBucket(key=key, tokens=capacity, updated=now)
+                    tokens = _refill(bucket.tokens, bucket.updated, now, capacity, refill_rate)
+                    if tokens < 1:
+                        return (1 - tokens) / refill_rate
+                    bucket.tokens = tokens - 1
+                    bucket.updated = now
+                    session.add(bucket)
+                    session.commit()
+                return 0
+            except IntegrityError:
+                # the bucket was created concurrently, take the token from it
+                continue
+
+    async def consume(self, key: str, capacity: int, refill_rate: float) -> float:
+        return await run_in_threadpool(self._consume, key, capacity, refill_rate)
+
+
+class RateLimiter:
+    """Allow `attempts` per `window` seconds and key, with bursts up to `attempts`."""
+
+    @typechecked
+    def __init__(self, backend: RateLimitBackend, attempts: int, window: float) -> None:
+        if attempts < 1 or window <= 0:
+            raise ValueError("attempts and window must be positive")
+        self.backend = backend
+        self.capacity = attempts
+        self.refill_rate = attempts / window
+
+    async def check(self, *keys: str) -> None:
+        """Count an attempt for `keys`, raise `RateLimitExceeded` if one is exhausted.
+
+        Keys are checked in order and checking stops at the first exhausted
+        one: its attempts do not count for the remaining keys. Pass the key of
+        the client (IP) first, so a throttled client does not drain the bucket
+        of the username it attacks.
+        """
+        for key in keys:
+            retry_after = await self.backend.consume(key, self.capacity, self.refill_rate)
+            if retry_after:
+                raise RateLimitExceeded(retry_after)
+
+
+_LOGIN_RATE_LIMITER: RateLimiter | None = None
+
+
+def get_login_rate_limiter() -> RateLimiter | None:
+    """Return the login rate limiter configured by `AUTH_SETTINGS`
+    (None if disabled), created on first use."""
+    global _LOGIN_RATE_LIMITER
+    if _LOGIN_RATE_LIMITER is None and AUTH_SETTINGS.login_rate_limit > 0:
+        backend_name = AUTH_SETTINGS.login_rate_limit_backend
+        if backend_name == "memory":
+            backend = MemoryRateLimitBackend(maxsize=AUTH_SETTINGS.login_rate_limit_cache_size)
+        elif backend_name == "sql":
+            backend = SQLRateLimitBackend(db_uri=AUTH_SETTINGS.db_uri)
+        else:
+            raise ValueError(f"Unknown rate limit backend {backend_name}")
+        _LOGIN_RATE_LIMITER = RateLimiter(
+            backend=backend,
+            attempts=AUTH_SETTINGS.login_rate_limit,
+            window=AUTH_SETTINGS.login_rate_limit_window,
+        )
+    return _LOGIN_RATE_LIMITER
+
+
+async def check_login_rate_limit(request: Request) -> None:
+    """Count a login attempt for the submitted username and the client IP."""
+    limiter = get_login_rate_limiter()
+    if limiter is None:
+        return
+    form = await request.form()
+    keys = [f"user:{form.get('username', '')}"]
+    if request.client is not None:
+        # a throttled client must not use up the attempts of the username
+        keys.insert(0, f"ip:{request.client.host}")
+    await limiter.check(*keys)
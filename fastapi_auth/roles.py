@@ -1,18 +1,52 @@
 """Roles module."""
 
-from pydantic import BaseModel, Field
+from functools import cached_property
 
-from typeguard import typechecked
+from pydantic import BaseModel, ConfigDict, Field, field_validator
 
-from .permissions import Permission
+from .typechecking import typechecked
+
+from .permissions import Permission, intern_permission, permissions_mask
 
 
 class Role(BaseModel):
-    """Roles"""
+    """Roles (immutable and hashable)"""
+
+    model_config = ConfigDict(frozen=True)
 
     name: str = Field(..., description="Name of the role")
     description: str = Field(..., description="Description of the role")
-    permissions: list[Permission] = []
+    permissions: tuple[Permission, ...] = ()
+
+    @field_validator("permissions")
+    @classmethod
+    def intern_permissions(cls, permissions: tuple[Permission, ...]) -> tuple[Permission, ...]:
+        """Share one instance of each permission between all roles."""
+        return tuple(intern_permission(permission) for permission in permissions)
+
+    def __eq__(self, other: object) -> bool:
+        # registered roles are compared by identity
+        return self is other or super().__eq__(other)
+
+    def __hash__(self) -> int:
+        # equal roles have equal names, no need to hash the permissions
+        return hash(self.name)
+
+    def __copy__(self) -> "Role":
+        # model_copy(update=...) may replace the permissions of the copy
+        copied = super().__copy__()
+        copied.__dict__.pop("permission_mask", None)
+        return copied
+
+    def __deepcopy__(self, memo: dict | None = None) -> "Role":
+        copied = super().__deepcopy__(memo)
+        copied.__dict__.pop("permission_mask", None)
+        return copied
+
+    @cached_property
+    def permission_mask(self) -> int:
+        """Return the bitmask of the role's permissions (computed once)."""
+        return permissions_mask(self.permissions)
 
 
 class RolesRegistry:
@@ -20,12 +54,23 @@ class RolesRegistry:
 
     def __init__(self):
         """Initialize the registry."""
-        self.roles = dict()
+        self.roles = {}
+        self.masks = {}
 
     @typechecked
-    def register(self, role: Role) -> None:
-        """Register a role."""
+    def register(self, role: Role) -> Role:
+        """Register a role and return the registered instance.
+
+        Registering a role equal to an already registered one keeps the
+        registered instance, so that roles handed out by the registry stay
+        singletons.
+        """
+        if self.roles.get(role.name) == role:
+            return self.roles[role.name]
         self.roles[role.name] = role
+        # precompute the permission bitmask at registration time
+        self.masks[role.name] = role.permission_mask
+        return role
 
     @typechecked
     def all_roles(self) -> list[Role]:
@@ -45,6 +90,14 @@ class RolesRegistry:
         except KeyError:
             raise ValueError(f"Role {role_name} not found in role registry")
 
+    @typechecked
+    def roles_mask(self, role_names: list[str]) -> int:
+        """Return the union of the permission bitmasks of the given (registered) roles."""
+        mask = 0
+        for role_name in role_names:
+            mask |= self.masks.get(role_name, 0)
+        return mask
+
     @typechecked
     def has_role(self, role_name: str) -> bool:
         """Check if the registry has a role."""
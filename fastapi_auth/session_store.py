@@ -0,0 +1,351 @@
+"""Server-side sessions: session stores and the middleware using them.
+
+The browser only receives an opaque session id cookie; the session data lives
+in a `SessionStore`. Sessions can therefore be revoked (on logout, password
+change and user deletion) and shared between worker processes (SQL and Redis
+stores).
+"""
+
+import asyncio
+import inspect
+import json
+import secrets
+import time
+import weakref
+from abc import ABC, abstractmethod
+from typing import Any
+
+from sqlmodel import Field, Session, SQLModel, delete
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import MutableHeaders
+from starlette.requests import HTTPConnection
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .cache import LRUCache
+from .engines import get_engine
+from .logger import LOG
+from .typechecking import typechecked
+
+
+def _username(data: dict) -> str | None:
+    user = data.get("user")
+    return user.get("name") if isinstance(user, dict) else None
+
+
+class SessionStore(ABC):
+    """Abstract base class for session stores.
+
+    Sessions expire `ttl` seconds after they were last saved.
+    """
+
+    # event loop the store is used on (set by the middleware and
+    # register_session_store()), see revoke_sessions()
+    loop: asyncio.AbstractEventLoop | None = None
+
+    def __init__(self, ttl: int) -> None:
+        self.ttl = ttl
+
+    @abstractmethod
+    async def load(self, session_id: str) -> dict | None:
+        """Return the session data or None if the session does not exist."""
+        raise NotImplementedError()  # pragma: no cover
+
+    @abstractmethod
+    async def save(self, session_id: str, data: dict) -> None:
+        """Create or replace a session."""
+        raise NotImplementedError()  # pragma: no cover
+
+    @abstractmethod
+    async def delete(self, session_id: str) -> None:
+        """Delete a session."""
+        raise NotImplementedError()  # pragma: no cover
+
+    @abstractmethod
+    async def revoke_user(self, username: str) -> None:
+        """Delete all sessions of a user."""
+        raise NotImplementedError()  # pragma: no cover
+
+    def revoke_user_sync(self, username: str) -> bool:
+        """Delete all sessions of a user without an event loop, if the store
+        can. Return False if `revoke_user()` must run on the store's loop."""
+        return False
+
+
+class MemorySessionStore(SessionStore):
+    """Session store in process memory (LRU with TTL), not shared between workers."""
+
+    @typechecked
+    def __init__(self, ttl: int, maxsize: int = 10000) -> None:
+        super().__init__(ttl)
+        self.cache = LRUCache(maxsize=maxsize, ttl=ttl)
+
+    async def load(self, session_id: str) -> dict | None:
+        data = self.cache.get(session_id)
+        return json.loads(data) if data is not None else None
+
+    async def save(self, session_id: str, data: dict) -> None:
+        self.cache.set(session_id, json.dumps(data))
+
+    async def delete(self, session_id: str) -> None:
+        self.cache.pop(session_id)
+
+    async def revoke_user(self, username: str) -> None:
+        self.revoke_user_sync(username)
+
+    def revoke_user_sync(self, username: str) -> bool:
+        for session_id, data in self.cache.items():
+            if _username(json.loads(data)) == username:
+                self.cache.pop(session_id)
+        return True
+
+
+class AuthSession(SQLModel, table=True):
+    __tablename__ = "auth_session"
+
+    session_id: str = Field(primary_key=True)
+    username: str | None = Field(default=None, index=True)
+    data: str
+    expires: float = Field(index=True)
+
+
+class SQLSessionStore(SessionStore):
+    """Session store in a SQL database, using the shared engine of `db_uri`.
+
+    Database calls run in Starlette's thread pool.
+    """
+
+    @typechecked
+    def __init__(self, ttl: int, db_uri: str) -> None:
+        super().__init__(ttl)
+        self.engine = get_engine(db_uri)
+        SQLModel.metadata.create_all(self.engine, tables=[AuthSession.__table__])
+
+    def _load(self, session_id: str) -> dict | None:
+        with Session(self.engine) as session:
+            row = session.get(AuthSession, session_id)
+            if row is None or row.expires < time.time():
+                return None
+            return json.loads(row.data)
+
+    def _save(self, session_id: str, data: dict) -> None:
+        with Session(self.engine) as session:
+            row = AuthSession(
+                session_id=session_id,
+                username=_username(data),
+                data=json.dumps(data),
+                expires=time.time() + self.ttl,
+            )
+            session.merge(row)
+            session.commit()
+
+    def _delete(self, *conditions) -> None:
+        with Session(self.engine) as session:
+            session.exec(delete(AuthSession).where(*conditions))
+            session.commit()
+
+    async def load(self, session_id: str) -> dict | None:
+        return await run_in_threadpool(self._load, session_id)
+
+    async def save(self, session_id: str, data: dict) -> None:
+        await run_in_threadpool(self._save, session_id, data)
+
+    async def delete(self, session_id: str) -> None:
+        await run_in_threadpool(self._delete, AuthSession.session_id == session_id)
+
+    async def revoke_user(self, username: str) -> None:
+        await run_in_threadpool(self._delete, AuthSession.username == username)
+
+    def revoke_user_sync(self, username: str) -> bool:
+        self._delete(AuthSession.username == username)
+        return True
+
+    def purge_expired(self) -> None:
+        """Delete all expired sessions."""
+        self._delete(AuthSession.expires < time.time())
+
+
+class RedisSessionStore(SessionStore):
+    """Session store in Redis or any server speaking the Redis protocol.
+
+    `client` is a `redis.Redis` or `redis.asyncio.Redis` instance (or anything
+    providing `get`, `set`, `delete`, `sadd`, `smembers` and `expire`).
+    """
+
+    def __init__(self, ttl: int, client: Any, prefix: str = "fastapi_auth:") -> None:
+        super().__init__(ttl)
+        self.client = client
+        self.prefix = prefix
+
+    async def _call(self, method: str, *args, **kwargs) -> Any:
+        result = getattr(self.client, method)(*args, **kwargs)
+        if inspect.isawaitable(result):
+            result = await result
+        return result
+
+    def _session_key(self, session_id: str) -> str:
+        return f"{self.prefix}session:{session_id}"
+
+    def _user_key(self, username: str) -> str:
+        return f"{self.prefix}user:{username}"
+
+    async def load(self, session_id: str) -> dict | None:
+        data = await self._call("get", self._session_key(session_id))
+        return json.loads(data) if data is not None else None
+
+    async def save(self, session_id: str, data: dict) -> None:
+        await self._call("set", self._session_key(session_id), json.dumps(data), ex=self.ttl)
+        username = _username(data)
+        if username is not None:
+            # index of the user's sessions, for revoke_user()
+            await self._call("sadd", self._user_key(username), session_id)
+            await self._call("expire", self._user_key(username), self.ttl)
+
+    async def delete(self, session_id: str) -> None:
+        await self._call("delete", self._session_key(session_id))
+
+    def _session_keys(self, session_ids: Any) -> list[str]:
+        return [self._session_key(sid.decode() if isinstance(sid, bytes) else sid) for sid in session_ids]
+
+    async def revoke_user(self, username: str) -> None:
+        session_ids = await self._call("smembers", self._user_key(username))
+        await self._call("delete", self._user_key(username), *self._session_keys(session_ids))
+
+    def revoke_user_sync(self, username: str) -> bool:
+        session_ids = self.client.smembers(self._user_key(username))
+        if inspect.isawaitable(session_ids):
+            # an asyncio client, bound to the event loop of the application
+            if inspect.iscoroutine(session_ids):
+                session_ids.close()
+            return False
+        self.client.delete(self._user_key(username), *self._session_keys(session_ids))
+        return True
+
+
+# stores of the running application, see register_session_store()
+_SESSION_STORES: "weakref.WeakSet[SessionStore]" = weakref.WeakSet()
+
+# revocations scheduled on a running event loop by revoke_sessions()
+_PENDING_REVOCATIONS: set[asyncio.Task] = set()
+
+
+def register_session_store(store: SessionStore, loop: asyncio.AbstractEventLoop | None = None) -> None:
+    """Revoke sessions in `store` when users change their password or are
+    deleted. `install_middleware()` registers the store it installs.
+
+    `loop` is the event loop the store (its client) is used on, by default
+    the running loop; the middleware sets it on the first request.
+    """
+    if loop is None:
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            pass
+    if loop is not None:
+        store.loop = loop
+    _SESSION_STORES.add(store)
+
+
+async def _revoke_user(store: SessionStore, usernames: list[str]) -> None:
+    for username in usernames:
+        await store.revoke_user(username)
+
+
+async def revoke_user_sessions(*usernames: str) -> None:
+    """Delete all sessions of `usernames` in all registered stores."""
+    for store in list(_SESSION_STORES):
+        await _revoke_user(store, list(usernames))
+
+
+def _revocation_done(task: asyncio.Task) -> None:
+    _PENDING_REVOCATIONS.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        LOG.error("Revoking sessions failed: {}", task.exception())
+
+
+def revoke_sessions(*usernames: str) -> None:
+    """Synchronous variant of `revoke_user_sessions()`.
+
+    Stores that can revoke synchronously (memory, SQL, Redis with a
+    synchronous client) do so directly. For the others, `revoke_user()` runs
+    on the event loop of the store and is waited for; failures are raised.
+    Called on that loop itself, it cannot be waited for and is scheduled
+    instead; failures are logged.
+    """
+    for store in list(_SESSION_STORES):
+        pending = [username for username in usernames if not store.revoke_user_sync(username)]
+        if not pending:
+            continue
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        loop = store.loop or running
+        if loop is None or not loop.is_running():
+            raise RuntimeError(f"No running event loop to revoke sessions in {type(store).__name__}")
+        if loop is running:
+            task = loop.create_task(_revoke_user(store, pending))
+            _PENDING_REVOCATIONS.add(task)
+            task.add_done_callback(_revocation_done)
+        else:
+            asyncio.run_coroutine_threadsafe(_revoke_user(store, pending), loop).result()
+
+
+class ServerSideSessionMiddleware:
+    """Session middleware keeping session data in a `SessionStore`.
+
+    Provides `request.session` like Starlette's `SessionMiddleware`. The
+    session id is replaced whenever the logged in user changes.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        store: SessionStore,
+        session_cookie: str = "session_id",
+        path: str = "/",
+        same_site: str = "lax",
+        https_only: bool = False,
+    ) -> None:
+        self.app = app
+        self.store = store
+        self.session_cookie = session_cookie
+        self.cookie_flags = f"path={path}; httponly; samesite={same_site}"
+        if https_only:
+            self.cookie_flags += "; secure"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        # the loop the store's client is used on, see revoke_sessions()
+        self.store.loop = asyncio.get_running_loop()
+        session_id = HTTPConnection(scope).cookies.get(self.session_cookie)
+        initial = await self.store.load(session_id) if session_id else None
+        if initial is None:
+            session_id = None
+            initial = {}
+        scope["session"] = json.loads(json.dumps(initial))
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                await self._commit(scope["session"], initial, session_id, MutableHeaders(scope=message))
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def _commit(self, session: dict, initial: dict, session_id: str | None, headers: MutableHeaders) -> None:
+        if session == initial:
+            return
+        if session_id is not None and (not session or session.get("user") != initial.get("user")):
+            await self.store.delete(session_id)
+            session_id = None
+        if session:
+            if session_id is None:
+                session_id = secrets.token_urlsafe(32)
+                cookie = f"{self.session_cookie}={session_id}; Max-Age={self.store.ttl}; {self.cookie_flags}"
+                headers.append("Set-Cookie", cookie)
+            await self.store.save(session_id, session)
+        else:
+            cookie = f"{self.session_cookie}=null; Max-Age=0; {self.cookie_flags}"
+            headers.append("Set-Cookie", cookie)
@@ -1,7 +1,8 @@
 from fastapi.testclient import TestClient
 import pytest
-from sqlmodel import SQLModel, create_engine
-from ..user_management_sqlobject import UserManagement
+from ..auth_config import AUTH_SETTINGS
+from ..engines import dispose_engine
+from ..user_management_sqlobject import UserManagement, clear_user_caches
 import uuid
 import os
 
@@ -12,22 +13,26 @@ admin_username = "admin"
 admin_password = "admin"
 
 
+@pytest.fixture(autouse=True)
+def user_caches():
+    # test databases reuse file names, do not share lookup caches between tests
+    yield
+    clear_user_caches()
+
+
 @pytest.fixture(scope="module")
 def user_management():
     # Ensure that the user management instance is initialized with a temporary database
-    def my_init(self, db_uri):
-        self.engine = create_engine(tmp_db_uri)
-        SQLModel.metadata.create_all(self.engine)
-
-    old_init = UserManagement.__init__
-    UserManagement.__init__ = my_init
-
     tmp_db = str(uuid.uuid4()) + ".db"
     tmp_db_uri = f"sqlite:///{tmp_db}"
-    um = UserManagement(tmp_db)
+    old_db_uri = AUTH_SETTINGS.db_uri
+    AUTH_SETTINGS.db_uri = tmp_db_uri
+
+    um = UserManagement(tmp_db_uri)
     um.add_user("admin", "admin", "Administrator")
     yield um
-    UserManagement.__init__ = old_init
+    AUTH_SETTINGS.db_uri = old_db_uri
+    dispose_engine(tmp_db_uri)
     if os.path.exists(tmp_db):
         os.unlink(tmp_db)
 
@@ -1,6 +1,14 @@
+import asyncio
+import time
+
 import pytest
+from fastapi.exceptions import HTTPException
+from starlette.requests import Request
 
+from .. import authenticator_registry
+from ..auth_config import AUTH_SETTINGS
 from ..authenticator_registry import Authenticator, AuthenticatorRegistry
+from ..users import User
 
 
 def test_authenticator_registry():
@@ -45,3 +53,138 @@ def test_authenticator_registry_with_multiple_authenticators():
 def test_authenticator_invoked_directly():
     with pytest.raises(TypeError):
         Authenticator()
+
+
+class StaticAuthenticator(Authenticator):
+    """Returns `user` after `delay` seconds (or raises `error`)."""
+
+    def __init__(self, name, user=None, delay=0, error=None):
+        self.name = name
+        self.user = user
+        self.delay = delay
+        self.error = error
+        self.finished = False
+
+    async def authenticate(self, request):
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise self.error
+        self.finished = True
+        return self.user
+
+
+def make_user(name):
+    return User(name=name, description=name, is_anonymous=False)
+
+
+def make_request():
+    return Request({"type": "http", "headers": []})
+
+
+def test_sequential():
+    registry = AuthenticatorRegistry(mode="sequential")
+    registry.add_authenticator(StaticAuthenticator("failing", error=RuntimeError("down")), 0)
+    registry.add_authenticator(StaticAuthenticator("none"), 1)
+    registry.add_authenticator(StaticAuthenticator("first", user=make_user("first")), 2)
+    registry.add_authenticator(StaticAuthenticator("second", user=make_user("second")), 3)
+    assert asyncio.run(registry.authenticate(make_request())).name == "first"
+
+    registry = AuthenticatorRegistry(mode="sequential")
+    registry.add_authenticator(StaticAuthenticator("none"), 0)
+    assert asyncio.run(registry.authenticate(make_request())) is None
+
+
+def test_sequential_timeout(monkeypatch):
+    messages = []
+    monkeypatch.setattr(authenticator_registry.LOG, "error", lambda message, *args: messages.append(message))
+    registry = AuthenticatorRegistry(mode="sequential", timeout=5)
+    slow = StaticAuthenticator("slow", user=make_user("slow"), delay=5)
+    registry.add_authenticator(slow, 0, timeout=0.05)
+    registry.add_authenticator(StaticAuthenticator("fast", user=make_user("fast")), 1)
+    assert registry.get_timeout(slow) == 0.05
+    assert registry.get_timeout(registry.authenticators[1]) == 5
+
+    start = time.monotonic()
+    assert asyncio.run(registry.authenticate(make_request())).name == "fast"
+    assert time.monotonic() - start < 1
+    assert not slow.finished
+    assert messages == ["Timeout authenticating with {}"]
+
+
+def test_concurrent():
+    registry = AuthenticatorRegistry(mode="concurrent")
+    slow = StaticAuthenticator("slow", user=make_user("slow"), delay=5)
+    registry.add_authenticator(slow, 0)
+    registry.add_authenticator(StaticAuthenticator("failing", error=RuntimeError("down")), 1)
+    registry.add_authenticator(StaticAuthenticator("fast", user=make_user("fast"), delay=0.01), 2)
+
+    start = time.monotonic()
+    assert asyncio.run(registry.authenticate(make_request())).name == "fast"
+    assert time.monotonic() - start < 1
+    # the slow authenticator was cancelled
+    assert not slow.finished
+
+
+def test_concurrent_timeout():
+    registry = AuthenticatorRegistry(mode="concurrent", timeout=0.05)
+    registry.add_authenticator(StaticAuthenticator("slow", user=make_user("slow"), delay=5), 0)
+    registry.add_authenticator(StaticAuthenticator("slow2", user=make_user("slow2"), delay=5), 1)
+    start = time.monotonic()
+    assert asyncio.run(registry.authenticate(make_request())) is None
+    assert time.monotonic() - start < 1
+
+
+def test_http_exceptions_are_raised():
+    for mode in ("sequential", "concurrent"):
+        registry = AuthenticatorRegistry(mode=mode)
+        registry.add_authenticator(StaticAuthenticator("busy", error=HTTPException(status_code=503)), 0)
+        registry.add_authenticator(StaticAuthenticator("slow", user=make_user("slow"), delay=5), 1)
+        with pytest.raises(HTTPException):
+            asyncio.run(registry.authenticate(make_request()))
+
+
+def test_unknown_mode():
+    registry = AuthenticatorRegistry(mode="random")
+    with pytest.raises(ValueError):
+        asyncio.run(registry.authenticate(make_request()))
+
+
+def test_stats():
+    registry = AuthenticatorRegistry(mode="sequential")
+    registry.add_authenticator(StaticAuthenticator("failing", error=RuntimeError("down")), 0)
+    registry.add_authenticator(StaticAuthenticator("none"), 1)
+    registry.add_authenticator(StaticAuthenticator("ok", user=make_user("ok")), 2)
+    asyncio.run(registry.authenticate(make_request()))
+    asyncio.run(registry.authenticate(make_request()))
+
+    stats = registry.get_stats()
+    assert stats["failing"]["calls"] == 2
+    assert stats["failing"]["errors"] == 2
+    assert stats["failing"]["error_rate"] == 1.0
+    assert stats["none"]["failures"] == 2
+    assert stats["ok"]["successes"] == 2
+    assert stats["ok"]["error_rate"] == 0.0
+    assert stats["ok"]["average_latency"] >= 0.0
+
+
+def test_circuit_breaker(monkeypatch):
+    monkeypatch.setattr(AUTH_SETTINGS, "authenticator_breaker_threshold", 2)
+    monkeypatch.setattr(AUTH_SETTINGS, "authenticator_breaker_cooldown", 60.0)
+
+    registry = AuthenticatorRegistry(mode="sequential")
+    failing = StaticAuthenticator("failing", error=RuntimeError("down"))
+    registry.add_authenticator(failing, 0)
+    for i in range(5):
+        asyncio.run(registry.authenticate(make_request()))
+
+    stats = registry.get_stats()["failing"]
+    assert stats["calls"] == 2
+    assert stats["skipped"] == 3
+    assert stats["circuit_open"]
+
+    # after the cool-down, the authenticator is tried again
+    failing.error = None
+    failing.user = make_user("back")
+    registry.stats[failing].open_until = 0.0
+    assert asyncio.run(registry.authenticate(make_request())).name == "back"
+    assert not registry.get_stats()["failing"]["circuit_open"]
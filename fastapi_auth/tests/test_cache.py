@@ -0,0 +1,57 @@
+import time
+
+from ..cache import LRUCache
+
+
+def test_get_set():
+    cache = LRUCache(maxsize=2)
+    assert cache.get("a") is None
+    assert cache.get("a", 42) == 42
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    assert "a" in cache
+    assert "b" not in cache
+    assert len(cache) == 1
+
+
+def test_lru_eviction():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    cache.get("a")
+    cache.set("c", 3)
+    assert "a" in cache
+    assert "b" not in cache
+    assert "c" in cache
+
+
+def test_ttl():
+    cache = LRUCache(maxsize=2, ttl=0.01)
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+    time.sleep(0.02)
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_pop_clear():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.pop("a") == 1
+    assert cache.pop("a", 42) == 42
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_disabled():
+    cache = LRUCache(maxsize=0)
+    cache.set("a", 1)
+    assert "a" not in cache
+
+
+def test_items():
+    cache = LRUCache(maxsize=2)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.items() == [("a", 1), ("b", 2)]
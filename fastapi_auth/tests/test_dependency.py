@@ -1,11 +1,14 @@
 import pytest
+from fastapi.exceptions import HTTPException
 from starlette.status import HTTP_200_OK
+from typeguard import TypeCheckError
 from .conftest import admin_username, admin_password
 
 from ..dependencies import Protected
 from ..roles import Role
 from ..permissions import Permission
 from ..auth_config import AUTH_SETTINGS
+from ..users import User, ANONYMOUS_USER
 
 
 def test_Protected():
@@ -73,3 +76,75 @@ def test_bypass_security(user_management, test_client):
     response = test_client.get("/admin")
     assert response.status_code == HTTP_200_OK
     AUTH_SETTINGS.always_superuser = False
+
+
+def test_Protected_check():
+    view = Permission(name="view", description="View")
+    edit = Permission(name="edit", description="Edit")
+    viewer = Role(name="viewer", description="viewer", permissions=[view])
+    editor = Role(name="editor", description="editor", permissions=[view, edit])
+    user = User(name="john", description="john", is_anonymous=False, roles=[viewer])
+
+    assert Protected(required_roles=[editor, viewer]).check(None, user) is user
+    assert Protected(required_permission=view).check(None, user) is user
+    with pytest.raises(HTTPException) as exc_info:
+        Protected(required_roles=[editor]).check(None, user)
+    assert exc_info.value.status_code == 403
+    with pytest.raises(HTTPException):
+        Protected(required_permission=edit).check(None, user)
+    with pytest.raises(HTTPException):
+        Protected(required_permission=view).check(None, ANONYMOUS_USER)
+
+
+def test_Protected_debug_typecheck():
+    view = Permission(name="view", description="View")
+    protected = Protected(required_permission=view)
+
+    AUTH_SETTINGS.debug_typecheck = True
+    try:
+        with pytest.raises(TypeCheckError):
+            protected(request=None, user="john")
+    finally:
+        AUTH_SETTINGS.debug_typecheck = False
+
+
+def test_get_user_cached():
+    from starlette.requests import Request
+
+    from ..dependencies import USER_CACHE, get_user
+
+    assert get_user(Request({"type": "http", "headers": [], "session": {}})) is ANONYMOUS_USER
+
+    role = Role(name="foo", description="foo")
+    payload = User(name="john", description="john", is_anonymous=False, roles=[role]).model_dump()
+
+    request = Request({"type": "http", "headers": [], "session": {"user": payload}})
+    user = get_user(request)
+    assert user.name == "john"
+    assert user.roles == (role,)
+    # memoized for the request
+    assert request.state.auth_user is user
+    assert get_user(request) is user
+    # shared between requests with the same session payload
+    assert get_user(Request({"type": "http", "headers": [], "session": {"user": dict(payload)}})) is user
+    USER_CACHE.clear()
+    assert get_user(Request({"type": "http", "headers": [], "session": {"user": payload}})) is not user
+
+
+def test_Protected_denial_log_is_sampled(monkeypatch):
+    from .. import dependencies
+    from ..logger import LogSampler
+
+    view = Permission(name="view", description="View")
+    user = User(name="john", description="john", is_anonymous=False, roles=[])
+    monkeypatch.setattr(dependencies, "DENIAL_SAMPLER", LogSampler(burst=2, interval=60))
+    messages = []
+    monkeypatch.setattr(dependencies.LOG, "error", lambda message, *args: messages.append(message.format(*args)))
+    for _ in range(5):
+        with pytest.raises(HTTPException) as exc_info:
+            Protected(required_permission=view).check(None, user)
+        assert exc_info.value.detail == "Permission denied for user john."
+    assert len(messages) == 2
+    assert messages[0].startswith(
+        "Permission denied for user john on None. Required roles: [], required permission: view"
+    )
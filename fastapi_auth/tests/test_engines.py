@@ -0,0 +1,71 @@
+import os
+import uuid
+
+import pytest
+
+from ..auth_config import AUTH_SETTINGS
+from ..engines import dispose_engine, engine_options, get_engine, sqlite_pragmas
+
+
+def test_get_engine_is_cached():
+    db_uri = "sqlite://"
+    engine = get_engine(db_uri)
+    assert get_engine(db_uri) is engine
+    dispose_engine(db_uri)
+    assert get_engine(db_uri) is not engine
+    dispose_engine(db_uri)
+
+
+def test_engine_options():
+    assert "pool_size" not in engine_options("sqlite://")
+    assert "pool_size" not in engine_options("sqlite:///:memory:")
+
+    options = engine_options("sqlite:///users.db")
+    assert options["pool_size"] == AUTH_SETTINGS.db_pool_size
+    assert options["max_overflow"] == AUTH_SETTINGS.db_max_overflow
+    assert options["pool_pre_ping"] == AUTH_SETTINGS.db_pool_pre_ping
+    assert options["pool_recycle"] == AUTH_SETTINGS.db_pool_recycle
+
+
+def test_file_engine_pool():
+    tmp_db = str(uuid.uuid4()) + ".db"
+    db_uri = f"sqlite:///{tmp_db}"
+    try:
+        engine = get_engine(db_uri)
+        assert engine.pool.size() == AUTH_SETTINGS.db_pool_size
+        dispose_engine(db_uri)
+    finally:
+        if os.path.exists(tmp_db):
+            os.unlink(tmp_db)
+
+
+def test_sqlite_pragmas(monkeypatch):
+    monkeypatch.setattr(AUTH_SETTINGS, "sqlite_journal_mode", "wal")
+    assert sqlite_pragmas()[0] == "PRAGMA journal_mode=WAL"
+    monkeypatch.setattr(AUTH_SETTINGS, "sqlite_synchronous", "sometimes")
+    with pytest.raises(ValueError):
+        sqlite_pragmas()
+    monkeypatch.setattr(AUTH_SETTINGS, "sqlite_synchronous", "NORMAL")
+    monkeypatch.setattr(AUTH_SETTINGS, "sqlite_journal_mode", "WAL; DROP TABLE user")
+    with pytest.raises(ValueError):
+        sqlite_pragmas()
+
+
+@pytest.mark.parametrize("tuning", [False, True])
+def test_sqlite_tuning(tmp_path, monkeypatch, tuning):
+    monkeypatch.setattr(AUTH_SETTINGS, "sqlite_tuning", tuning)
+    monkeypatch.setattr(AUTH_SETTINGS, "sqlite_busy_timeout", 1234)
+    db_uri = f"sqlite:///{tmp_path / 'users.db'}"
+    try:
+        with get_engine(db_uri).connect() as connection:
+            journal_mode = connection.exec_driver_sql("PRAGMA journal_mode").scalar()
+            synchronous = connection.exec_driver_sql("PRAGMA synchronous").scalar()
+            busy_timeout = connection.exec_driver_sql("PRAGMA busy_timeout").scalar()
+    finally:
+        dispose_engine(db_uri)
+    if tuning:
+        # synchronous: 1 = NORMAL
+        assert (journal_mode, synchronous, busy_timeout) == ("wal", 1, 1234)
+    else:
+        assert journal_mode == "delete"
+        assert busy_timeout != 1234
@@ -0,0 +1,64 @@
+from unittest import mock
+
+from ..auth_config import AUTH_SETTINGS
+from ..logger import LazyLogger, LogSampler
+
+
+def test_log_sampler():
+    sampler = LogSampler(burst=2, interval=60)
+    with mock.patch("fastapi_auth.logger.time.monotonic", return_value=100.0):
+        assert sampler.allow("a") == 0
+        assert sampler.allow("a") == 0
+        assert sampler.allow("a") is None
+        assert sampler.allow("a") is None
+        # keys are independent
+        assert sampler.allow("b") == 0
+    with mock.patch("fastapi_auth.logger.time.monotonic", return_value=160.0):
+        # the next interval reports the dropped messages
+        assert sampler.allow("a") == 2
+        assert sampler.allow("a") == 0
+        assert sampler.allow("a") is None
+    with mock.patch("fastapi_auth.logger.time.monotonic", return_value=300.0):
+        assert sampler.allow("a") == 1
+
+
+def test_log_sampler_disabled():
+    sampler = LogSampler(burst=0, interval=60)
+    assert all(sampler.allow("a") == 0 for _ in range(100))
+
+
+def test_lazy_logger():
+    lazy = LazyLogger()
+    with mock.patch("fastapi_auth.logger.logger") as logger:
+        # no sink is added before the first use
+        assert not logger.add.called
+        lazy.info("first")
+        lazy.info("second")
+    # only the queued file sink is added, the application's handlers are kept
+    assert not logger.remove.called
+    logger.add.assert_called_once()
+    assert logger.add.call_args.kwargs["enqueue"]
+    assert logger.info.call_count == 2
+    # the bound method is cached on the instance
+    assert lazy.__dict__["info"] is logger.info
+
+
+def test_lazy_logger_queue_stderr(monkeypatch):
+    monkeypatch.setattr(AUTH_SETTINGS, "log_queue_stderr", True)
+    lazy = LazyLogger()
+    with mock.patch("fastapi_auth.logger.logger") as logger:
+        lazy.configure()
+    # the default stderr handler is replaced, the file sink added
+    logger.remove.assert_called_once_with(0)
+    assert logger.add.call_count == 2
+    assert all(call.kwargs["enqueue"] for call in logger.add.call_args_list)
+
+
+def test_lazy_logger_console_removed(monkeypatch):
+    monkeypatch.setattr(AUTH_SETTINGS, "log_queue_stderr", True)
+    lazy = LazyLogger()
+    with mock.patch("fastapi_auth.logger.logger") as logger:
+        # the application removed loguru's default handler before
+        logger.remove.side_effect = ValueError
+        lazy.configure()
+    logger.add.assert_called_once()
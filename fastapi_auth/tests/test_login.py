@@ -1,3 +1,4 @@
+import pytest
 from starlette.status import HTTP_200_OK
 from .conftest import admin_username, admin_password
 
@@ -22,3 +23,28 @@ def test_login_improper_credentials(user_management, test_client):
     response = test_client.post("/auth/login", data={"username": admin_username, "password": "wrong_password"})
     assert response.status_code == HTTP_200_OK
     assert "could not be logged in" in response.text
+
+
+def test_login_hash_pool_saturated(user_management, test_client, monkeypatch):
+    from ..worker_pool import HASH_POOL, WorkerPoolSaturated
+
+    async def saturated(*args, **kwargs):
+        raise WorkerPoolSaturated()
+
+    monkeypatch.setattr(HASH_POOL, "run", saturated)
+    response = test_client.post("/auth/login", data={"username": admin_username, "password": admin_password})
+    assert response.status_code == 503
+
+
+def test_login_async_db(user_management, test_client):
+    pytest.importorskip("aiosqlite")
+    from ..auth_config import AUTH_SETTINGS
+
+    AUTH_SETTINGS.async_db = True
+    try:
+        response = test_client.post("/auth/login", data={"username": admin_username, "password": admin_password})
+        assert "now logged in" in response.text
+        response = test_client.post("/auth/login", data={"username": admin_username, "password": "wrong_password"})
+        assert "could not be logged in" in response.text
+    finally:
+        AUTH_SETTINGS.async_db = False
@@ -0,0 +1,90 @@
+import pytest
+
+from ..auth_config import AUTH_SETTINGS
+from ..metrics import (
+    LOGIN_ATTEMPTS,
+    METRICS_REGISTRY,
+    PASSWORD_VERIFY_SECONDS,
+    PROTECTED_CHECKS,
+    SESSION_DECODE_SECONDS,
+    Counter,
+    Histogram,
+)
+from .conftest import admin_password, admin_username
+
+
+@pytest.fixture
+def metrics_enabled(monkeypatch):
+    monkeypatch.setattr(AUTH_SETTINGS, "metrics_enabled", True)
+    METRICS_REGISTRY.clear()
+    yield
+    METRICS_REGISTRY.clear()
+
+
+def test_counter(metrics_enabled):
+    counter = Counter("requests_total", "Requests.", ("method",))
+    counter.inc(method="GET")
+    counter.inc(2, method="GET")
+    counter.inc(method='P"OST')
+    assert counter.value(method="GET") == 3
+    assert counter.render() == (
+        "# HELP requests_total Requests.\n"
+        "# TYPE requests_total counter\n"
+        'requests_total{method="GET"} 3\n'
+        'requests_total{method="P\\"OST"} 1\n'
+    )
+    with pytest.raises(ValueError):
+        counter.inc()
+
+
+def test_histogram(metrics_enabled):
+    histogram = Histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+    histogram.observe(0.05)
+    histogram.observe(0.1)
+    histogram.observe(5)
+    with histogram.time():
+        pass
+    assert histogram.count() == 4
+    lines = histogram.render().splitlines()
+    assert lines[2:5] == [
+        'latency_seconds_bucket{le="0.1"} 3',
+        'latency_seconds_bucket{le="1.0"} 3',
+        'latency_seconds_bucket{le="+Inf"} 4',
+    ]
+    assert lines[5].startswith("latency_seconds_sum 5.15")
+    assert lines[6] == "latency_seconds_count 4"
+
+
+def test_disabled():
+    counter = Counter("requests_total", "Requests.")
+    histogram = Histogram("latency_seconds", "Latency.")
+    counter.inc()
+    histogram.observe(1.0)
+    assert counter.value() == 0
+    assert histogram.count() == 0
+
+
+def test_metrics_route_disabled(test_client):
+    assert test_client.get("/auth/metrics").status_code == 404
+
+
+def test_metrics_route(metrics_enabled, user_management, test_client):
+    response = test_client.post("/auth/login", data={"username": admin_username, "password": admin_password})
+    assert "now logged in" in response.text
+    test_client.post("/auth/login", data={"username": admin_username, "password": "wrong"})
+    assert test_client.get("/admin").status_code == 200
+    test_client.get("/auth/logout")
+    assert test_client.get("/admin").status_code == 403
+
+    assert LOGIN_ATTEMPTS.value(authenticator="DefaultAuthenticator", result="success") == 1
+    assert LOGIN_ATTEMPTS.value(authenticator="DefaultAuthenticator", result="failure") == 1
+    assert PASSWORD_VERIFY_SECONDS.count(algorithm="bcrypt") == 2
+    assert SESSION_DECODE_SECONDS.count() >= 1
+    assert PROTECTED_CHECKS.value(route="/admin", result="allow") == 1
+    assert PROTECTED_CHECKS.value(route="/admin", result="deny") == 1
+
+    response = test_client.get("/auth/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'fastapi_auth_login_attempts_total{authenticator="DefaultAuthenticator",result="success"} 1' in response.text
+    assert "# TYPE fastapi_auth_db_lookup_seconds histogram" in response.text
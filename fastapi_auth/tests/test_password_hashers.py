@@ -0,0 +1,77 @@
+import pytest
+
+from .. import password_hashers
+from ..auth_config import AUTH_SETTINGS
+from ..password_hashers import BcryptHasher, get_password_hasher, get_verifier, make_password_hasher
+
+
+@pytest.fixture
+def argon2_hasher():
+    pytest.importorskip("argon2")
+    return password_hashers.Argon2Hasher(time_cost=1, memory_cost=8, parallelism=1)
+
+
+def test_bcrypt():
+    hasher = BcryptHasher(rounds=4)
+    hashed = hasher.hash("password")
+    assert hashed.startswith("$2b$04$")
+    assert hasher.identifies(hashed)
+    assert hasher.verify("password", hashed)
+    assert not hasher.verify("wrong", hashed)
+    assert not hasher.needs_rehash(hashed)
+    assert BcryptHasher(rounds=5).needs_rehash(hashed)
+
+
+def test_bcrypt_invalid_rounds():
+    with pytest.raises(ValueError):
+        BcryptHasher(rounds=3)
+
+
+def test_argon2(argon2_hasher):
+    hashed = argon2_hasher.hash("password")
+    assert hashed.startswith("$argon2id$")
+    assert argon2_hasher.identifies(hashed)
+    assert argon2_hasher.verify("password", hashed)
+    assert not argon2_hasher.verify("wrong", hashed)
+    assert not argon2_hasher.needs_rehash(hashed)
+    assert password_hashers.Argon2Hasher(time_cost=2, memory_cost=8, parallelism=1).needs_rehash(hashed)
+
+
+def test_migration_between_algorithms(argon2_hasher):
+    bcrypt_hash = BcryptHasher(rounds=4).hash("password")
+    assert argon2_hasher.needs_rehash(bcrypt_hash)
+    assert BcryptHasher(rounds=4).needs_rehash(argon2_hasher.hash("password"))
+
+
+def test_dummy_hash_is_cached():
+    hasher = BcryptHasher(rounds=4)
+    assert hasher.dummy_hash is hasher.dummy_hash
+    assert hasher.verify("dummy password", hasher.dummy_hash)
+
+
+def test_make_password_hasher(monkeypatch):
+    monkeypatch.setattr(AUTH_SETTINGS, "bcrypt_rounds", 5)
+    assert make_password_hasher("bcrypt").rounds == 5
+    with pytest.raises(ValueError):
+        make_password_hasher("md5")
+
+
+def test_get_password_hasher(monkeypatch):
+    monkeypatch.setattr(password_hashers, "_PASSWORD_HASHER", None)
+    monkeypatch.setattr(AUTH_SETTINGS, "bcrypt_rounds", 4)
+    hasher = get_password_hasher()
+    assert isinstance(hasher, BcryptHasher)
+    assert hasher.rounds == 4
+    assert get_password_hasher() is hasher
+
+
+def test_get_verifier(monkeypatch, argon2_hasher):
+    monkeypatch.setattr(password_hashers, "_PASSWORD_HASHER", argon2_hasher)
+    monkeypatch.setattr(password_hashers, "_VERIFIERS", {})
+    argon2_hash = argon2_hasher.hash("password")
+    bcrypt_hash = BcryptHasher(rounds=4).hash("password")
+    assert get_verifier(argon2_hash) is argon2_hasher
+    verifier = get_verifier(bcrypt_hash)
+    assert isinstance(verifier, BcryptHasher)
+    assert verifier.verify("password", bcrypt_hash)
+    assert get_verifier(bcrypt_hash) is verifier
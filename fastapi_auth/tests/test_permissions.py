@@ -1,6 +1,8 @@
+import gc
+
 import pytest
 
-from ..permissions import Permission
+from ..permissions import Permission, intern_permission, permission_bit, permissions_mask
 
 from pydantic import ValidationError
 
@@ -19,3 +21,35 @@ def test_permission_without_name():
 def test_permission_without_description():
     with pytest.raises(ValidationError):
         Permission(name="read")
+
+
+def test_permission_bit():
+    read = Permission(name="read", description="Can read data")
+    write = Permission(name="write", description="Can write data")
+    assert permission_bit(read) == permission_bit(Permission(name="read", description="Can read data"))
+    assert permission_bit(read) != permission_bit(write)
+    assert permissions_mask([read, write]) == permission_bit(read) | permission_bit(write)
+    assert permissions_mask([]) == 0
+
+
+def test_permission_frozen_and_hashable():
+    read = Permission(name="read", description="Can read data")
+    with pytest.raises(ValidationError):
+        read.name = "write"
+    assert read == Permission(name="read", description="Can read data")
+    assert {read, Permission(name="read", description="Can read data")} == {read}
+
+
+def test_intern_permission():
+    read = intern_permission(Permission(name="intern-read", description="Can read data"))
+    assert intern_permission(Permission(name="intern-read", description="Can read data")) is read
+    assert intern_permission(Permission(name="intern-read", description="Other")) is not read
+
+
+def test_intern_permission_weak():
+    from ..permissions import _PERMISSIONS
+
+    intern_permission(Permission(name="intern-unused", description="Unused permission"))
+    gc.collect()
+    # permissions no longer in use are not kept alive
+    assert ("intern-unused", "Unused permission") not in _PERMISSIONS
@@ -0,0 +1,121 @@
+import asyncio
+import os
+import threading
+import uuid
+
+import pytest
+
+from .. import rate_limit
+from ..auth_config import AUTH_SETTINGS
+from ..engines import dispose_engine
+from ..rate_limit import MemoryRateLimitBackend, RateLimiter, RateLimitExceeded, SQLRateLimitBackend
+from .conftest import admin_password, admin_username
+
+
+@pytest.fixture(params=["memory", "sql"])
+def backend(request):
+    if request.param == "memory":
+        yield MemoryRateLimitBackend()
+    else:
+        tmp_db = str(uuid.uuid4()) + ".db"
+        db_uri = f"sqlite:///{tmp_db}"
+        yield SQLRateLimitBackend(db_uri=db_uri)
+        dispose_engine(db_uri)
+        os.unlink(tmp_db)
+
+
+def test_rate_limiter(backend):
+    limiter = RateLimiter(backend=backend, attempts=3, window=60)
+
+    async def main():
+        for i in range(3):
+            await limiter.check("user:john", "ip:127.0.0.1")
+        with pytest.raises(RateLimitExceeded) as exc_info:
+            await limiter.check("user:john", "ip:127.0.0.2")
+        assert exc_info.value.status_code == 429
+        assert int(exc_info.value.headers["Retry-After"]) >= 1
+        with pytest.raises(RateLimitExceeded):
+            await limiter.check("user:jane", "ip:127.0.0.1")
+        await limiter.check("user:jane", "ip:127.0.0.2")
+
+    asyncio.run(main())
+
+
+def test_refill(backend):
+    limiter = RateLimiter(backend=backend, attempts=1, window=0.05)
+
+    async def main():
+        await limiter.check("user:john")
+        with pytest.raises(RateLimitExceeded):
+            await limiter.check("user:john")
+        await asyncio.sleep(0.06)
+        await limiter.check("user:john")
+
+    asyncio.run(main())
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        RateLimiter(backend=MemoryRateLimitBackend(), attempts=0, window=60)
+
+
+def test_login_rate_limit(user_management, test_client, monkeypatch):
+    from ..worker_pool import HASH_POOL
+
+    monkeypatch.setattr(
+        rate_limit, "_LOGIN_RATE_LIMITER", RateLimiter(backend=MemoryRateLimitBackend(), attempts=2, window=60)
+    )
+    for i in range(2):
+        response = test_client.post("/auth/login", data={"username": admin_username, "password": "wrong_password"})
+        assert response.status_code == 200
+
+    async def no_hashing(*args, **kwargs):
+        raise AssertionError("password must not be checked")
+
+    monkeypatch.setattr(HASH_POOL, "run", no_hashing)
+    response = test_client.post("/auth/login", data={"username": admin_username, "password": admin_password})
+    assert response.status_code == 429
+    monkeypatch.setattr(AUTH_SETTINGS, "tokens_enabled", True)
+    response = test_client.post("/auth/token", data={"username": admin_username, "password": admin_password})
+    assert response.status_code == 429
+
+
+def test_sql_backend_concurrent(tmp_path):
+    backend = SQLRateLimitBackend(db_uri=f"sqlite:///{tmp_path / 'rate_limit.db'}")
+    keys = [f"user:{i}" for i in range(20)]
+    threads = 8
+    barrier = threading.Barrier(threads)
+    results = []
+
+    def worker():
+        barrier.wait()
+        for key in keys:
+            results.append((key, backend._consume(key, 5, 1e-6)))
+
+    try:
+        pool = [threading.Thread(target=worker) for _ in range(threads)]
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+    finally:
+        dispose_engine(backend.engine.url.render_as_string())
+    # no errors, and exactly `capacity` attempts per key got a token
+    assert len(results) == threads * len(keys)
+    for key in keys:
+        assert sum(1 for k, retry_after in results if k == key and retry_after == 0) == 5
+
+
+def test_exhausted_key_stops_check():
+    backend = MemoryRateLimitBackend()
+    limiter = RateLimiter(backend=backend, attempts=1, window=60)
+
+    async def main():
+        await limiter.check("ip:127.0.0.1", "user:john")
+        # the throttled IP does not use up further attempts of the user
+        for i in range(3):
+            with pytest.raises(RateLimitExceeded):
+                await limiter.check("ip:127.0.0.1", "user:jane")
+        await limiter.check("ip:127.0.0.2", "user:jane")
+
+    asyncio.run(main())
@@ -1,6 +1,6 @@
 import pytest
 from ..roles import Role, RolesRegistry
-from ..permissions import Permission
+from ..permissions import Permission, permission_bit
 from typeguard import TypeCheckError
 
 
@@ -29,7 +29,7 @@ def test_role_with_permissions():
         Permission(name="write", description="Can write data"),
     ]
     role = Role(name="admin", description="Admin role", permissions=permissions)
-    assert role.permissions == permissions
+    assert role.permissions == tuple(permissions)
 
 
 def test_role_creation2():
@@ -61,3 +61,57 @@ def test_role_registry():
         registry.get_role("user")
     with pytest.raises(TypeCheckError):
         registry.register("my_role")
+
+
+def test_role_frozen_and_hashable():
+    read = Permission(name="read", description="Read permission")
+    role = Role(name="admin", description="admin", permissions=[read])
+    with pytest.raises(ValidationError):
+        role.name = "user"
+    # the cached mask works on frozen roles
+    assert role.permission_mask == permission_bit(read)
+    other = Role(
+        name="admin", description="admin", permissions=[Permission(name="read", description="Read permission")]
+    )
+    assert other == role
+    assert {role, other} == {role}
+    assert role != Role(name="admin", description="admin")
+    # roles share interned permissions
+    assert other.permissions[0] is role.permissions[0]
+
+
+def test_role_model_copy():
+    read = Permission(name="read", description="Read permission")
+    write = Permission(name="write", description="Write permission")
+    role = Role(name="editor", description="editor", permissions=[read, write])
+    assert role.permission_mask == permission_bit(read) | permission_bit(write)
+    copy = role.model_copy(update={"permissions": (read,)})
+    assert copy.permission_mask == permission_bit(read)
+    assert role.permission_mask == permission_bit(read) | permission_bit(write)
+
+
+def test_role_registry_singletons():
+    registry = RolesRegistry()
+    role = Role(name="admin", description="admin")
+    assert registry.register(role) is role
+    # registering an equal role keeps the registered instance
+    assert registry.register(Role(name="admin", description="admin")) is role
+    assert registry.get_role("admin") is role
+    # a different role replaces it
+    changed = Role(name="admin", description="changed")
+    assert registry.register(changed) is changed
+    assert registry.get_role("admin") is changed
+
+
+def test_role_registry_masks():
+    registry = RolesRegistry()
+    READ = Permission(name="read", description="Read permission")
+    WRITE = Permission(name="write", description="Write permission")
+    admin = Role(name="admin", description="admin", permissions=[READ, WRITE])
+    viewer = Role(name="viewer", description="viewer", permissions=[READ])
+    registry.register(admin)
+    registry.register(viewer)
+    assert registry.masks["admin"] == admin.permission_mask
+    assert registry.roles_mask(["viewer"]) == permission_bit(READ)
+    assert registry.roles_mask(["admin", "viewer", "unknown"]) == permission_bit(READ) | permission_bit(WRITE)
+    assert registry.roles_mask([]) == 0
@@ -0,0 +1,214 @@
+import asyncio
+import os
+import threading
+import uuid
+import weakref
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from .. import password_hashers, session_store
+from ..auth_routes import install_middleware
+from ..engines import dispose_engine
+from ..password_hashers import BcryptHasher
+from ..session_store import MemorySessionStore, RedisSessionStore, SQLSessionStore, register_session_store
+from ..user_management_sqlobject import UserManagement
+
+
+class FakeRedis:
+    """Minimal in-process stand-in for a Redis client."""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value.encode()
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def sadd(self, key, *members):
+        self.data.setdefault(key, set()).update(m.encode() for m in members)
+
+    def smembers(self, key):
+        return self.data.get(key, set())
+
+    def expire(self, key, seconds):
+        pass
+
+
+class AsyncFakeRedis(FakeRedis):
+    """Stand-in for a `redis.asyncio` client, bound to the loop it is used on."""
+
+    def __init__(self):
+        super().__init__()
+        self.loops = set()
+
+    def __getattribute__(self, name):
+        method = super().__getattribute__(name)
+        if name not in ("get", "set", "delete", "sadd", "smembers", "expire"):
+            return method
+
+        async def call(*args, **kwargs):
+            self.loops.add(asyncio.get_running_loop())
+            return method(*args, **kwargs)
+
+        return call
+
+
+@pytest.fixture
+def app_loop():
+    """An event loop running in another thread, like the one of the application."""
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever)
+    thread.start()
+    yield loop
+    loop.call_soon_threadsafe(loop.stop)
+    thread.join()
+    loop.close()
+
+
+@pytest.fixture(params=["memory", "sql", "redis"])
+def store(request):
+    if request.param == "memory":
+        yield MemorySessionStore(ttl=60)
+    elif request.param == "redis":
+        yield RedisSessionStore(ttl=60, client=FakeRedis())
+    else:
+        tmp_db = str(uuid.uuid4()) + ".db"
+        db_uri = f"sqlite:///{tmp_db}"
+        yield SQLSessionStore(ttl=60, db_uri=db_uri)
+        dispose_engine(db_uri)
+        os.unlink(tmp_db)
+
+
+def test_store(store):
+    async def main():
+        assert await store.load("s1") is None
+        await store.save("s1", {"user": {"name": "john"}})
+        await store.save("s2", {"user": {"name": "john"}})
+        await store.save("s3", {"user": {"name": "jane"}})
+        await store.save("s4", {"foo": "bar"})
+        assert await store.load("s1") == {"user": {"name": "john"}}
+        assert await store.load("s4") == {"foo": "bar"}
+
+        await store.delete("s4")
+        assert await store.load("s4") is None
+
+        await store.revoke_user("john")
+        assert await store.load("s1") is None
+        assert await store.load("s2") is None
+        assert await store.load("s3") == {"user": {"name": "jane"}}
+
+    asyncio.run(main())
+
+
+def test_sql_store_expiry():
+    tmp_db = str(uuid.uuid4()) + ".db"
+    db_uri = f"sqlite:///{tmp_db}"
+    store = SQLSessionStore(ttl=-1, db_uri=db_uri)
+    try:
+        asyncio.run(store.save("s1", {"foo": "bar"}))
+        assert asyncio.run(store.load("s1")) is None
+        store.purge_expired()
+    finally:
+        dispose_engine(db_uri)
+        os.unlink(tmp_db)
+
+
+def test_middleware():
+    store = MemorySessionStore(ttl=60)
+    app = FastAPI()
+    install_middleware(app, session_store=store)
+
+    @app.get("/login/{name}")
+    def login(name: str, request: Request):
+        request.session["user"] = {"name": name}
+        return {}
+
+    @app.get("/session")
+    def session(request: Request):
+        return request.session
+
+    @app.get("/logout")
+    def logout(request: Request):
+        request.session.clear()
+        return {}
+
+    client = TestClient(app)
+    assert client.get("/session").json() == {}
+    assert "set-cookie" not in client.get("/session").headers
+
+    client.get("/login/john")
+    session_id = client.cookies["session_id"]
+    assert "john" not in session_id
+    assert client.get("/session").json() == {"user": {"name": "john"}}
+
+    # a new login gets a new session id
+    client.get("/login/jane")
+    assert client.cookies["session_id"] != session_id
+    assert asyncio.run(store.load(session_id)) is None
+
+    # revoked on logout
+    session_id = client.cookies["session_id"]
+    client.get("/logout")
+    assert asyncio.run(store.load(session_id)) is None
+    assert client.get("/session").json() == {}
+
+    # revoked server-side
+    client.get("/login/john")
+    asyncio.run(store.revoke_user("john"))
+    assert client.get("/session").json() == {}
+
+
+def test_user_management_revokes_sessions(store, tmp_path, monkeypatch):
+    monkeypatch.setattr(password_hashers, "_PASSWORD_HASHER", BcryptHasher(rounds=4))
+    db_uri = f"sqlite:///{tmp_path / 'users.db'}"
+    um = UserManagement(db_uri)
+    register_session_store(store)
+    try:
+        um.add_users([{"username": name, "password": "secret", "roles": "User"} for name in ("john", "jane", "jack")])
+        for name in ("john", "jane", "jack"):
+            asyncio.run(store.save(f"session-{name}", {"user": {"name": name}}))
+
+        um.change_password("john", "new secret")
+        assert asyncio.run(store.load("session-john")) is None
+        um.delete_user("jane")
+        assert asyncio.run(store.load("session-jane")) is None
+        assert asyncio.run(store.load("session-jack")) == {"user": {"name": "jack"}}
+        # sessions hold the role names
+        um.set_roles_many({"jack": "Administrator"})
+        assert asyncio.run(store.load("session-jack")) is None
+    finally:
+        dispose_engine(db_uri)
+
+
+def test_revoke_sessions_on_store_loop(app_loop, tmp_path, monkeypatch):
+    monkeypatch.setattr(password_hashers, "_PASSWORD_HASHER", BcryptHasher(rounds=4))
+    monkeypatch.setattr(session_store, "_SESSION_STORES", weakref.WeakSet())
+    db_uri = f"sqlite:///{tmp_path / 'users.db'}"
+    um = UserManagement(db_uri)
+    client = AsyncFakeRedis()
+    store = RedisSessionStore(ttl=60, client=client)
+    register_session_store(store, app_loop)
+    try:
+        um.add_user("john", "secret", "User")
+        asyncio.run_coroutine_threadsafe(store.save("session-john", {"user": {"name": "john"}}), app_loop).result()
+        # revoked on the loop of the client and waited for
+        um.change_password("john", "new secret")
+        assert "fastapi_auth:session:session-john" not in client.data
+        assert client.loops == {app_loop}
+
+        async def fail(username):
+            raise ConnectionError("redis is down")
+
+        monkeypatch.setattr(store, "revoke_user", fail)
+        with pytest.raises(ConnectionError):
+            um.delete_user("john")
+    finally:
+        dispose_engine(db_uri)
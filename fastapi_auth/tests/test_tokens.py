@@ -0,0 +1,136 @@
+import asyncio
+import time
+
+import pytest
+from cryptography.hazmat.primitives.asymmetric.ed25519 import Ed25519PrivateKey
+from cryptography.hazmat.primitives.serialization import Encoding, NoEncryption, PrivateFormat, PublicFormat
+from starlette.requests import Request
+from starlette.status import HTTP_200_OK
+
+from ..auth_config import AUTH_SETTINGS
+from ..roles import ROLES_REGISTRY
+from ..tokens import InvalidToken, TokenAuthenticator, TokenSigner, bearer_token
+from ..users import User
+from .conftest import admin_password, admin_username
+
+
+def make_user():
+    return User(name="john", description="John", is_anonymous=False, roles=ROLES_REGISTRY.all_roles()[:1])
+
+
+def test_hs256():
+    signer = TokenSigner(secret_key="secret")
+    user = make_user()
+    token = signer.issue(user)
+    claims = signer.verify(token)
+    assert claims["sub"] == "john"
+    assert claims["roles"] == user.role_names()
+
+    token_user = signer.user_from_token(token)
+    assert token_user.name == "john"
+    assert token_user.roles == user.roles
+    assert token_user.is_authenticated
+    # cached
+    assert signer.user_from_token(token) is token_user
+
+    with pytest.raises(InvalidToken):
+        TokenSigner(secret_key="other").verify(token)
+    with pytest.raises(InvalidToken):
+        signer.verify(token[:-4] + "AAAA")
+    with pytest.raises(InvalidToken):
+        signer.verify("garbage")
+
+
+def test_expired():
+    signer = TokenSigner(secret_key="secret", lifetime=-1)
+    token = signer.issue(make_user())
+    with pytest.raises(InvalidToken):
+        signer.user_from_token(token)
+
+
+def test_expired_cached():
+    signer = TokenSigner(secret_key="secret")
+    token = signer.issue(make_user())
+    signer.user_from_token(token)
+    _, user = signer.cache.get(token)
+    signer.cache.set(token, (time.time() - 1, user))
+    with pytest.raises(InvalidToken):
+        signer.user_from_token(token)
+
+
+def test_eddsa():
+    private_key = Ed25519PrivateKey.generate()
+    private_pem = private_key.private_bytes(Encoding.PEM, PrivateFormat.PKCS8, NoEncryption()).decode()
+    public_pem = private_key.public_key().public_bytes(Encoding.PEM, PublicFormat.SubjectPublicKeyInfo).decode()
+
+    token = TokenSigner(algorithm="EdDSA", private_key=private_pem).issue(make_user())
+    verifier = TokenSigner(algorithm="EdDSA", public_key=public_pem)
+    assert verifier.verify(token)["sub"] == "john"
+    with pytest.raises(ValueError):
+        verifier.issue(make_user())
+    # HS256 token is rejected by an EdDSA verifier
+    with pytest.raises(InvalidToken):
+        verifier.verify(TokenSigner(secret_key="secret").issue(make_user()))
+
+
+def test_invalid_configuration():
+    with pytest.raises(ValueError):
+        TokenSigner(algorithm="HS256")
+    with pytest.raises(ValueError):
+        TokenSigner(algorithm="EdDSA")
+    with pytest.raises(ValueError):
+        TokenSigner(algorithm="none", secret_key="secret")
+
+
+def test_bearer_token():
+    def request(authorization):
+        return Request({"type": "http", "headers": [(b"authorization", authorization.encode())]})
+
+    assert bearer_token(Request({"type": "http", "headers": []})) is None
+    assert bearer_token(request("Bearer abc")) == "abc"
+    assert bearer_token(request("Basic abc")) is None
+    assert bearer_token(request("Bearer")) is None
+
+
+def test_token_authenticator(user_management, test_client, monkeypatch):
+    monkeypatch.setattr(AUTH_SETTINGS, "tokens_enabled", True)
+    response = test_client.post("/auth/token", data={"username": admin_username, "password": admin_password})
+    assert response.status_code == HTTP_200_OK
+    token = response.json()["access_token"]
+
+    request = Request({"type": "http", "headers": [(b"authorization", f"Bearer {token}".encode())]})
+    user = asyncio.run(TokenAuthenticator().authenticate(request))
+    assert user.name == admin_username
+    request = Request({"type": "http", "headers": [(b"authorization", b"Bearer invalid")]})
+    assert asyncio.run(TokenAuthenticator().authenticate(request)) is None
+
+
+def test_token_endpoint(user_management, test_client, monkeypatch):
+    monkeypatch.setattr(AUTH_SETTINGS, "tokens_enabled", True)
+    test_client.get("/auth/logout")
+    response = test_client.post("/auth/token", data={"username": admin_username, "password": "wrong_password"})
+    assert response.status_code == 401
+
+    response = test_client.post("/auth/token", data={"username": admin_username, "password": admin_password})
+    assert response.json()["token_type"] == "bearer"
+    token = response.json()["access_token"]
+
+    assert test_client.get("/admin").status_code == 403
+    response = test_client.get("/admin", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == HTTP_200_OK
+    assert response.json()["user"]["name"] == admin_username
+    response = test_client.get("/admin", headers={"Authorization": "Bearer invalid"})
+    assert response.status_code == 403
+
+
+def test_tokens_disabled(user_management, test_client, monkeypatch):
+    monkeypatch.setattr(AUTH_SETTINGS, "tokens_enabled", True)
+    test_client.get("/auth/logout")
+    response = test_client.post("/auth/token", data={"username": admin_username, "password": admin_password})
+    token = response.json()["access_token"]
+
+    # neither issued nor accepted by default
+    monkeypatch.setattr(AUTH_SETTINGS, "tokens_enabled", False)
+    response = test_client.post("/auth/token", data={"username": admin_username, "password": admin_password})
+    assert response.status_code == 404
+    assert test_client.get("/admin", headers={"Authorization": f"Bearer {token}"}).status_code == 403
@@ -0,0 +1,44 @@
+import asyncio
+from unittest import mock
+
+import pytest
+import typeguard
+from typeguard import TypeCheckError
+
+from ..typechecking import typechecked
+
+
+def test_typechecked_on_first_call():
+    @typechecked
+    def double(value: int) -> int:
+        return 2 * value
+
+    with mock.patch.object(typeguard, "typechecked", wraps=typeguard.typechecked) as instrument:
+        assert not instrument.called
+        assert double(2) == 4
+        assert double(3) == 6
+    instrument.assert_called_once()
+    with pytest.raises(TypeCheckError):
+        double("2")
+
+
+def test_typechecked_coroutine():
+    @typechecked
+    async def double(value: int) -> int:
+        return 2 * value
+
+    assert asyncio.iscoroutinefunction(double)
+    assert asyncio.run(double(2)) == 4
+    with pytest.raises(TypeCheckError):
+        asyncio.run(double("2"))
+
+
+def test_typechecked_method():
+    class Counter:
+        @typechecked
+        def add(self, value: int) -> int:
+            return value
+
+    assert Counter().add(1) == 1
+    with pytest.raises(TypeCheckError):
+        Counter().add("1")
@@ -0,0 +1,148 @@
+import json
+
+import pytest
+from typer.testing import CliRunner
+
+from .. import password_hashers
+from ..auth_config import AUTH_SETTINGS
+from ..engines import dispose_engine
+from ..password_hashers import BcryptHasher
+from ..user_cmd import app, read_users
+from ..user_management_sqlobject import UserManagement
+
+runner = CliRunner()
+
+
+@pytest.fixture
+def um(tmp_path, monkeypatch):
+    db_uri = f"sqlite:///{tmp_path / 'users.db'}"
+    monkeypatch.setattr(AUTH_SETTINGS, "db_uri", db_uri)
+    monkeypatch.setattr(password_hashers, "_PASSWORD_HASHER", BcryptHasher(rounds=4))
+    yield UserManagement(db_uri)
+    dispose_engine(db_uri)
+
+
+def test_read_users():
+    csv_lines = ["username,roles,password\n", 'alice,"Administrator,User",secret\n']
+    assert list(read_users(csv_lines, "csv")) == [
+        {"username": "alice", "roles": "Administrator,User", "password": "secret", "password_hash": None}
+    ]
+    jsonl_lines = ['{"username": "bob", "roles": ["User"], "password_hash": "$2b$04$x"}\n', "\n"]
+    assert list(read_users(jsonl_lines, "jsonl")) == [
+        {"username": "bob", "roles": "User", "password": None, "password_hash": "$2b$04$x"}
+    ]
+
+
+def test_import_csv(um, tmp_path):
+    filename = tmp_path / "users.csv"
+    filename.write_text("username,roles,password\n" + "".join(f'user{i},"User,Editor",pw{i}\n' for i in range(5)))
+    result = runner.invoke(app, ["import", str(filename), "--batch-size", "2", "--workers", "1"])
+    assert result.exit_code == 0, result.output
+    assert len(um.get_users()) == 5
+    assert um.get_user("user3", "pw3") == {"username": "user3", "roles": ["User", "Editor"]}
+
+
+def test_import_with_process_pool(um, tmp_path):
+    filename = tmp_path / "users.jsonl"
+    records = [{"username": f"user{i}", "roles": ["User"], "password": f"pw{i}"} for i in range(4)]
+    filename.write_text("".join(json.dumps(record) + "\n" for record in records))
+    result = runner.invoke(app, ["import", str(filename), "--workers", "2"])
+    assert result.exit_code == 0, result.output
+    assert um.verify_password("user2", "pw2")
+
+
+def test_import_existing_user(um, tmp_path):
+    um.add_user("user1", "old", "User")
+    filename = tmp_path / "users.csv"
+    filename.write_text("username,roles,password\nuser0,User,pw0\nuser1,User,pw1\n")
+    result = runner.invoke(app, ["import", str(filename), "--workers", "1"])
+    assert result.exit_code != 0
+    # all or nothing per batch
+    assert not um.has_user("user0")
+
+    result = runner.invoke(app, ["import", str(filename), "--workers", "1", "--skip-existing"])
+    assert result.exit_code == 0, result.output
+    assert um.verify_password("user0", "pw0")
+    assert um.verify_password("user1", "old")
+
+
+def test_import_invalid_hash(um, tmp_path):
+    filename = tmp_path / "users.csv"
+    filename.write_text("username,roles,password_hash\nuser0,User,plain\n")
+    result = runner.invoke(app, ["import", str(filename), "--workers", "1"])
+    assert result.exit_code != 0
+    assert not um.has_user("user0")
+
+
+@pytest.mark.parametrize("suffix", ["csv", "jsonl"])
+def test_export_import_roundtrip(um, tmp_path, suffix):
+    um.add_user("alice", "secret", "Administrator,User")
+    um.add_user("bob", "password", "User")
+    filename = tmp_path / f"users.{suffix}"
+    result = runner.invoke(app, ["export", str(filename)])
+    assert result.exit_code == 0, result.output
+    for username in ("alice", "bob"):
+        um.delete_user(username)
+
+    result = runner.invoke(app, ["import", str(filename), "--workers", "1"])
+    assert result.exit_code == 0, result.output
+    assert um.get_user("alice", "secret") == {"username": "alice", "roles": ["Administrator", "User"]}
+    assert um.verify_password("bob", "password")
+
+
+def test_export_stdout(um):
+    um.add_user("alice", "secret", "User")
+    result = runner.invoke(app, ["export", "--format", "jsonl"])
+    assert result.exit_code == 0, result.output
+    record = json.loads(result.stdout)
+    assert record["username"] == "alice"
+    assert record["roles"] == ["User"]
+    assert record["password_hash"].startswith("$2b$04$")
+
+
+def test_list_users(um):
+    hashed = password_hashers.get_password_hasher().dummy_hash
+    um.add_hashed_users([{"username": f"user{i}", "password": hashed, "roles": "User"} for i in range(5)])
+    result = runner.invoke(app, ["list-users", "--batch-size", "2"])
+    assert result.exit_code == 0, result.output
+    assert all(f"user{i}" in result.stdout for i in range(5))
+
+    options = ["--format", "json", "--offset", "1", "--limit", "2", "--batch-size", "2"]
+    result = runner.invoke(app, ["list-users", *options])
+    assert result.exit_code == 0, result.output
+    assert [record["username"] for record in json.loads(result.stdout)] == ["user1", "user2"]
+
+    result = runner.invoke(app, ["list-users", "--format", "json", "--role", "Administrator"])
+    assert json.loads(result.stdout) == []
+
+
+def test_migrate_roles(um):
+    um.add_user("alice", "secret", "User")
+    result = runner.invoke(app, ["migrate-roles"])
+    assert result.exit_code == 0, result.output
+    assert "Updated 0 user roles." in result.stdout
+
+
+def test_delete_many(um):
+    um.add_user("alice", "secret", "User")
+    um.add_user("bob", "secret", "User")
+    result = runner.invoke(app, ["delete", "alice", "unknown"])
+    assert result.exit_code != 0
+    assert um.has_user("alice")
+    result = runner.invoke(app, ["delete", "alice", "bob"])
+    assert result.exit_code == 0, result.output
+    assert list(um.iter_users()) == []
+
+
+def test_set_password_revokes_sql_sessions(um, monkeypatch):
+    import asyncio
+
+    from ..session_store import SQLSessionStore
+
+    monkeypatch.setattr(AUTH_SETTINGS, "session_backend", "sql")
+    store = SQLSessionStore(ttl=60, db_uri=AUTH_SETTINGS.db_uri)
+    um.add_user("alice", "secret", "User")
+    asyncio.run(store.save("s1", {"user": {"name": "alice"}}))
+    result = runner.invoke(app, ["set-password", "alice", "new secret"])
+    assert result.exit_code == 0, result.output
+    assert asyncio.run(store.load("s1")) is None
@@ -0,0 +1,144 @@
+import asyncio
+import os
+import uuid
+
+import pytest
+from sqlalchemy import text
+
+from .. import password_hashers
+from ..auth_config import AUTH_SETTINGS
+from ..engines import dispose_engine
+from ..password_hashers import BcryptHasher
+from ..user_management_async import AsyncUserManagement, dispose_async_engine, to_async_uri
+from ..user_management_sqlobject import UserManagement
+
+# the async extra (aiosqlite) is optional
+pytest.importorskip("aiosqlite")
+
+
+@pytest.fixture
+def run():
+    """Run a coroutine against a fresh AsyncUserManagement on a local SQLite file."""
+    db_temp = str(uuid.uuid4()) + ".db"
+    um = AsyncUserManagement(f"sqlite:///{db_temp}")
+
+    def runner(func):
+        async def main():
+            try:
+                return await func(um)
+            finally:
+                await dispose_async_engine(um.db_uri)
+
+        return asyncio.run(main())
+
+    yield runner
+    if os.path.exists(db_temp):
+        os.unlink(db_temp)
+
+
+def test_to_async_uri():
+    assert to_async_uri("sqlite:///users.db") == "sqlite+aiosqlite:///users.db"
+    assert to_async_uri("sqlite+aiosqlite:///users.db") == "sqlite+aiosqlite:///users.db"
+    assert to_async_uri("postgresql://u:p@host/db") == "postgresql+asyncpg://u:p@host/db"
+
+
+def test_add_user(run):
+    async def func(um):
+        await um.add_user("admin", "password", "admin,user")
+        assert await um.has_user("admin")
+        with pytest.raises(ValueError):
+            await um.add_user("admin", "password", "admin,user")
+
+    run(func)
+
+
+def test_delete_user(run):
+    async def func(um):
+        await um.add_user("admin", "password", "admin,user")
+        await um.delete_user("admin")
+        assert not await um.has_user("admin")
+        with pytest.raises(ValueError):
+            await um.delete_user("admin")
+
+    run(func)
+
+
+def test_get_user(run):
+    async def func(um):
+        assert await um.get_user("admin", "password") is None
+        await um.add_user("admin", "password", "admin,user")
+        assert await um.get_user("admin", "password") == {"username": "admin", "roles": ["admin", "user"]}
+        assert await um.get_user("admin", "wrong") is None
+        assert len(await um.get_users()) == 1
+
+    run(func)
+
+
+def test_change_password(run):
+    async def func(um):
+        await um.add_user("admin", "password", "admin,user")
+        await um.change_password("admin", "new_password")
+        assert await um.verify_password("admin", "new_password")
+        assert not await um.verify_password("admin", "password")
+        with pytest.raises(ValueError):
+            await um.change_password("other", "new_password")
+        with pytest.raises(ValueError):
+            await um.verify_password("other", "password")
+
+    run(func)
+
+
+def test_rehash_on_login(run, monkeypatch):
+    async def func(um):
+        monkeypatch.setattr(password_hashers, "_PASSWORD_HASHER", BcryptHasher(rounds=4))
+        await um.add_user("admin", "password", "admin,user")
+        monkeypatch.setattr(password_hashers, "_PASSWORD_HASHER", BcryptHasher(rounds=5))
+        assert await um.get_user("admin", "password") == {"username": "admin", "roles": ["admin", "user"]}
+        users = await um.get_users()
+        assert users[0].password.startswith("$2b$05$")
+        assert await um.verify_password("admin", "password")
+
+    run(func)
+
+
+def test_user_roles(run):
+    async def func(um):
+        await um.add_user("admin", "password", "admin,user")
+        sync_db_uri = um.db_uri.replace("+aiosqlite", "")
+        try:
+            sync_um = UserManagement(sync_db_uri)
+            assert sync_um.users_with_role("admin") == ["admin"]
+            await um.delete_user("admin")
+            assert sync_um.count_by_role() == {}
+        finally:
+            dispose_engine(sync_db_uri)
+
+    run(func)
+
+
+def test_caches_shared_with_sync_backend(run):
+    async def func(um):
+        assert await um.get_user("admin", "password") is None
+        assert "admin" in um.caches.missing_users
+        sync_db_uri = um.db_uri.replace("+aiosqlite", "")
+        try:
+            sync_um = UserManagement(sync_db_uri)
+            assert sync_um.caches is um.caches
+            # users added by either backend are found by the other one
+            sync_um.add_user("admin", "password", "admin,user")
+            assert await um.get_user("admin", "password") == {"username": "admin", "roles": ["admin", "user"]}
+        finally:
+            dispose_engine(sync_db_uri)
+
+    run(func)
+
+
+def test_sqlite_tuning(run, monkeypatch):
+    monkeypatch.setattr(AUTH_SETTINGS, "sqlite_tuning", True)
+
+    async def func(um):
+        async with await um._session() as session:
+            result = await session.exec(text("PRAGMA journal_mode"))
+            assert result.scalar() == "wal"
+
+    run(func)
@@ -1,16 +1,24 @@
 import unittest
-from ..user_management_sqlobject import UserManagement
+from unittest import mock
+from ..user_management_sqlobject import User, UserManagement, UserRole, check_password, dummy_hash, role_names
+from .. import password_hashers, user_management_sqlobject
+from ..auth_config import AUTH_SETTINGS
+from ..engines import dispose_engine
+from ..password_hashers import BcryptHasher
 
 import os
 import pytest
+from sqlmodel import Session
 
 
 class TestUserManagement(unittest.TestCase):
     def setUp(self):
         self.db_temp = "xx.db"
-        self.um = UserManagement(f"sqlite:///{self.db_temp}")
+        self.db_uri = f"sqlite:///{self.db_temp}"
+        self.um = UserManagement(self.db_uri)
 
     def tearDown(self):
+        dispose_engine(self.db_uri)
         os.unlink(self.db_temp)
 
     def test_add_user(self):
@@ -66,3 +74,212 @@ class TestUserManagement(unittest.TestCase):
     def test_verify_password_non_existing_user(self):
         with pytest.raises(ValueError):
             self.um.verify_password("admin", "password")
+
+    def test_engine_is_shared(self):
+        self.assertIs(UserManagement(self.db_uri).engine, self.um.engine)
+
+    def test_get_non_existing_user_cached(self):
+        self.assertIsNone(self.um.get_user("admin", "password"))
+        self.assertIn("admin", self.um.missing_users)
+        # shared between instances
+        self.assertIn("admin", UserManagement(self.db_uri).missing_users)
+        self.um.add_user("admin", "password", "admin,user")
+        self.assertNotIn("admin", self.um.missing_users)
+        self.assertEqual(self.um.get_user("admin", "password"), {"username": "admin", "roles": ["admin", "user"]})
+
+    def test_get_non_existing_user_checks_dummy_hash(self):
+        with mock.patch(
+            "fastapi_auth.user_management_sqlobject.check_password", wraps=check_password
+        ) as check_password_mock:
+            self.um.get_user("admin", "password")
+            self.um.get_user("admin", "password")
+        self.assertEqual(check_password_mock.call_count, 2)
+        check_password_mock.assert_called_with("password", dummy_hash())
+
+    def test_verified_credentials_disabled_by_default(self):
+        self.um.add_user("admin", "password", "admin,user")
+        self.um.get_user("admin", "password")
+        self.assertEqual(len(self.um.verified_credentials), 0)
+
+    @mock.patch.object(AUTH_SETTINGS, "credential_cache_ttl", 30)
+    def test_verified_credentials_cached(self):
+        self.um.add_user("admin", "password", "admin,user")
+        self.um.get_user("admin", "password")
+        with mock.patch(
+            "fastapi_auth.user_management_sqlobject.check_password", return_value=False
+        ) as check_password_mock:
+            user = self.um.get_user("admin", "password")
+            self.assertIsNone(self.um.get_user("admin", "wrong"))
+        self.assertEqual(user, {"username": "admin", "roles": ["admin", "user"]})
+        # only the wrong password was checked
+        self.assertEqual(check_password_mock.call_count, 1)
+        # the cache does not contain plain passwords
+        self.assertNotIn("password", str(self.um.verified_credentials.items()))
+
+    @mock.patch.object(AUTH_SETTINGS, "credential_cache_ttl", 30)
+    def test_verified_credentials_invalidated_by_change_password(self):
+        self.um.add_user("admin", "password", "admin,user")
+        self.um.get_user("admin", "password")
+        self.um.change_password("admin", "new_password")
+        self.assertIsNone(self.um.get_user("admin", "password"))
+        self.assertIsNotNone(self.um.get_user("admin", "new_password"))
+
+    @mock.patch.object(AUTH_SETTINGS, "credential_cache_ttl", 30)
+    def test_verified_credentials_invalidated_by_delete_user(self):
+        self.um.add_user("admin", "password", "admin,user")
+        self.um.get_user("admin", "password")
+        self.um.delete_user("admin")
+        self.assertIsNone(self.um.get_user("admin", "password"))
+
+    def _stored_hash(self, username):
+        with Session(self.um.engine) as session:
+            return session.get(User, username).password
+
+    def test_rehash_on_login(self):
+        with mock.patch.object(password_hashers, "_PASSWORD_HASHER", BcryptHasher(rounds=4)):
+            self.um.add_user("admin", "password", "admin,user")
+        self.assertTrue(self._stored_hash("admin").startswith("$2b$04$"))
+        with mock.patch.object(password_hashers, "_PASSWORD_HASHER", BcryptHasher(rounds=5)):
+            self.assertIsNone(self.um.get_user("admin", "wrong"))
+            self.assertTrue(self._stored_hash("admin").startswith("$2b$04$"))
+            user = self.um.get_user("admin", "password")
+            self.assertTrue(self._stored_hash("admin").startswith("$2b$05$"))
+            self.assertEqual(user, {"username": "admin", "roles": ["admin", "user"]})
+            self.assertTrue(self.um.verify_password("admin", "password"))
+
+    def test_rehash_to_argon2(self):
+        pytest.importorskip("argon2")
+        self.um.add_user("admin", "password", "admin,user")
+        hasher = password_hashers.Argon2Hasher(time_cost=1, memory_cost=8, parallelism=1)
+        with mock.patch.object(password_hashers, "_PASSWORD_HASHER", hasher):
+            self.assertIsNotNone(self.um.get_user("admin", "password"))
+            self.assertTrue(self._stored_hash("admin").startswith("$argon2id$"))
+            self.assertIsNotNone(self.um.get_user("admin", "password"))
+
+    def test_add_hashed_users(self):
+        hashed = dummy_hash()
+        self.um.add_user("admin", "password", "admin")
+        users = [{"username": name, "password": hashed, "roles": "user"} for name in ("admin", "user1", "user2")]
+        with pytest.raises(ValueError):
+            self.um.add_hashed_users(users)
+        self.assertFalse(self.um.has_user("user1"))
+        self.assertEqual(self.um.add_hashed_users(users, skip_existing=True), 2)
+        self.assertTrue(self.um.verify_password("user2", "dummy password"))
+        with pytest.raises(ValueError):
+            self.um.add_hashed_users([users[1], users[1]])
+
+    def test_iter_users(self):
+        hashed = dummy_hash()
+        names = ["alice", "bob", "bobby", "carol", "dave", "b_x"]
+        self.um.add_hashed_users(
+            [{"username": name, "password": hashed, "roles": "admin,user" if name < "c" else "user"} for name in names]
+        )
+        self.assertEqual([user.username for user in self.um.iter_users(batch_size=2)], sorted(names))
+        self.assertEqual([user.username for user in self.um.iter_users(batch_size=2, prefix="bob")], ["bob", "bobby"])
+        # LIKE wildcards in the prefix are escaped
+        self.assertEqual([user.username for user in self.um.iter_users(prefix="b_")], ["b_x"])
+        self.assertEqual(
+            [user.username for user in self.um.iter_users(batch_size=1, role="admin")], ["alice", "b_x", "bob", "bobby"]
+        )
+        self.assertEqual(list(self.um.iter_users(role="adm")), [])
+        with pytest.raises(ValueError):
+            list(self.um.iter_users(batch_size=0))
+
+    def test_role_names(self):
+        self.assertEqual(role_names("admin,user,admin,"), ["admin", "user"])
+        self.assertEqual(role_names(""), [])
+
+    def test_users_with_role(self):
+        self.um.add_user("admin", "password", "admin,user")
+        self.um.add_hashed_users([{"username": "bob", "password": dummy_hash(), "roles": "user"}])
+        self.assertEqual(self.um.users_with_role("user"), ["admin", "bob"])
+        self.assertEqual(self.um.users_with_role("admin"), ["admin"])
+        self.assertEqual(self.um.count_by_role(), {"admin": 1, "user": 2})
+        self.um.delete_user("admin")
+        self.assertEqual(self.um.users_with_role("admin"), [])
+        self.assertEqual(self.um.count_by_role(), {"user": 1})
+
+    def test_migrate_roles(self):
+        # users of a database without the user_roles table
+        with Session(self.um.engine) as session:
+            for i in range(5):
+                session.add(User(username=f"user{i}", password=dummy_hash(), roles="user,editor" if i % 2 else "user"))
+            session.commit()
+        self.assertEqual(self.um.migrate_roles(batch_size=2), 7)
+        self.assertEqual(self.um.count_by_role(), {"editor": 2, "user": 5})
+        self.assertEqual(self.um.migrate_roles(), 0)
+        with Session(self.um.engine) as session:
+            self.assertIsNotNone(session.get(UserRole, ("user1", "editor")))
+            # roles changed and users deleted without updating user_roles
+            session.get(User, "user1").roles = "user"
+            session.delete(session.get(User, "user2"))
+            session.commit()
+        self.assertEqual(self.um.migrate_roles(batch_size=2), 2)
+        self.assertEqual(self.um.count_by_role(), {"editor": 1, "user": 4})
+
+    def test_user_roles_reconciled_on_first_use(self):
+        with Session(self.um.engine) as session:
+            session.add(User(username="admin", password=dummy_hash(), roles="admin,user"))
+            session.add(User(username="bob", password=dummy_hash(), roles="user"))
+            session.commit()
+        self.assertEqual(self.um.users_with_role("user"), ["admin", "bob"])
+        self.assertEqual([user.username for user in self.um.iter_users(role="admin")], ["admin"])
+        self.assertEqual(self.um.count_by_role(), {"admin": 1, "user": 2})
+
+    def test_add_users(self):
+        self.um.add_user("admin", "password", "admin")
+        users = [{"username": f"user{i}", "password": f"pw{i}", "roles": "user"} for i in range(3)]
+        with pytest.raises(ValueError):
+            self.um.add_users([*users, {"username": "admin", "password": "pw", "roles": "user"}])
+        self.assertFalse(self.um.has_user("user0"))
+        self.um.add_users(users)
+        self.assertTrue(self.um.verify_password("user2", "pw2"))
+        self.assertEqual(self.um.users_with_role("user"), ["user0", "user1", "user2"])
+
+    def test_delete_users(self):
+        self.um.add_hashed_users(
+            [{"username": f"user{i}", "password": dummy_hash(), "roles": "user"} for i in range(3)]
+        )
+        with pytest.raises(ValueError):
+            self.um.delete_users(["user0", "unknown"])
+        self.assertTrue(self.um.has_user("user0"))
+        self.um.delete_users(["user0", "user1", "user0"])
+        self.assertEqual([user.username for user in self.um.iter_users()], ["user2"])
+        self.assertEqual(self.um.users_with_role("user"), ["user2"])
+
+    @mock.patch.object(AUTH_SETTINGS, "credential_cache_ttl", 30)
+    def test_set_roles_many(self):
+        self.um.add_user("admin", "password", "admin")
+        self.um.add_user("bob", "password", "user")
+        self.um.get_user("admin", "password")
+        with pytest.raises(ValueError):
+            self.um.set_roles_many({"admin": "user", "unknown": "user"})
+        self.assertEqual(self.um.users_with_role("admin"), ["admin"])
+        self.um.set_roles_many({"admin": "user,editor", "bob": "editor"})
+        self.assertEqual(self.um.count_by_role(), {"editor": 2, "user": 1})
+        # the cached credentials with the old roles were dropped
+        self.assertEqual(self.um.get_user("admin", "password"), {"username": "admin", "roles": ["user", "editor"]})
+
+    def test_change_passwords(self):
+        self.um.add_user("admin", "password", "admin")
+        self.um.add_user("bob", "password", "user")
+        with mock.patch.object(user_management_sqlobject, "hash_password") as hash_password, pytest.raises(ValueError):
+            self.um.change_passwords({"admin": "new", "unknown": "new"})
+        # nothing is hashed for a failing batch
+        hash_password.assert_not_called()
+        self.assertTrue(self.um.verify_password("admin", "password"))
+        self.um.change_passwords({"admin": "new_admin", "bob": "new_bob"})
+        self.assertTrue(self.um.verify_password("admin", "new_admin"))
+        self.assertTrue(self.um.verify_password("bob", "new_bob"))
+
+    def test_batches_larger_than_in_chunk_size(self):
+        with mock.patch("fastapi_auth.user_management_sqlobject.IN_CHUNK_SIZE", 2):
+            self.um.add_hashed_users(
+                [{"username": f"user{i}", "password": dummy_hash(), "roles": "user"} for i in range(5)]
+            )
+            with pytest.raises(ValueError):
+                self.um.add_hashed_users([{"username": "user4", "password": dummy_hash(), "roles": "user"}])
+            self.um.set_roles_many({f"user{i}": "editor" for i in range(5)})
+            self.assertEqual(self.um.count_by_role(), {"editor": 5})
+            self.um.delete_users([f"user{i}" for i in range(5)])
+        self.assertEqual(list(self.um.iter_users()), [])
@@ -27,7 +27,7 @@ def test_user_without_description():
 def test_user_with_roles():
     roles = [Role(name="admin", description="Admin role"), Role(name="user", description="User role")]
     user = User(name="John Doe", description="Test user", roles=roles)
-    assert user.roles == roles
+    assert user.roles == tuple(roles)
 
 
 def test_has_role():
@@ -39,6 +39,11 @@ def test_has_role():
     assert user.has_role_by_name("admin") == True
     assert user.has_role_by_name("user") == False
 
+    # assigning roles invalidates the cached role set
+    user.roles = [Role(name="user", description="User role")]
+    assert user.has_role(role) == False
+    assert user.has_role(Role(name="user", description="User role")) == True
+
 
 def test_role_names():
     perm1 = Permission(name="read", description="Read permission")
@@ -50,3 +55,76 @@ def test_role_names():
     user = User(name="John Doe", description="Test user", roles=roles)
     assert user.role_names() == ["admin", "user"]
     assert list(user.all_permission_names()) == (["read", "write"])
+
+
+def test_has_permission():
+    read = Permission(name="read", description="Read permission")
+    write = Permission(name="write", description="Write permission")
+    delete = Permission(name="delete", description="Delete permission")
+    roles = [Role(name=f"role{i}", description="Role", permissions=[read]) for i in range(100)]
+    user = User(name="John Doe", description="Test user", roles=roles)
+    assert user.has_permission(read)
+    assert not user.has_permission(write)
+    assert not user.has_permission(Permission(name="read", description="Other read permission"))
+
+    # assigning roles invalidates the cached mask
+    user.roles = [Role(name="editor", description="Editor role", permissions=[write, delete])]
+    assert not user.has_permission(read)
+    assert user.has_permission(write)
+    assert user.has_permission(delete)
+
+
+def test_roles_immutable():
+    read = Permission(name="read", description="Read permission")
+    role = Role(name="reader", description="Reader role", permissions=[read])
+    user = User(name="John Doe", description="Test user")
+    assert not user.has_permission(read)
+    # roles cannot be changed in place behind the cached permission mask
+    with pytest.raises(AttributeError):
+        user.roles.append(role)
+    user.roles = [*user.roles, role]
+    assert isinstance(user.roles, tuple)
+    assert user.has_permission(read)
+    assert user.has_role(role)
+    assert user.has_role_by_name("reader")
+
+
+def test_model_copy():
+    read = Permission(name="read", description="Read permission")
+    role = Role(name="reader", description="Reader role", permissions=[read])
+    user = User(name="John Doe", description="Test user", roles=[role])
+    assert user.has_permission(read)
+    assert user.role_name_set == {"reader"}
+    # the copy does not reuse the role data cached for the original roles
+    copy = user.model_copy(update={"roles": ()})
+    assert not copy.has_permission(read)
+    assert not copy.has_role(role)
+    assert copy.role_name_set == frozenset()
+    assert not user.model_copy(update={"roles": ()}, deep=True).has_permission(read)
+    assert user.has_permission(read)
+    assert user.model_copy().has_permission(read)
+
+
+def test_session_payload():
+    from ..roles import ROLES_REGISTRY
+
+    role = Role(name="session-test", description="Session test role")
+    ROLES_REGISTRY.register(role)
+    try:
+        unregistered = Role(name="unregistered", description="Unregistered role")
+        user = User(name="John Doe", description="Test user", is_anonymous=False, roles=[role, unregistered])
+        payload = user.session_payload()
+        assert payload["roles"] == ["session-test", "unregistered"]
+
+        restored = User.from_session_payload(payload)
+        assert restored.name == "John Doe"
+        assert not restored.is_anonymous
+        assert restored.roles == (role,)
+        assert restored.roles[0] is role
+
+        # payloads holding complete roles are still accepted
+        legacy = User.from_session_payload(user.model_dump())
+        assert legacy.roles == (role, unregistered)
+        assert legacy.roles[0] is role
+    finally:
+        del ROLES_REGISTRY.roles["session-test"]
@@ -0,0 +1,56 @@
+import asyncio
+import threading
+
+import pytest
+
+from ..worker_pool import BoundedWorkerPool, WorkerPoolSaturated
+
+
+def test_run():
+    pool = BoundedWorkerPool(max_workers=2, max_queue_size=2)
+    assert asyncio.run(pool.run(pow, 2, 10)) == 1024
+    pool.shutdown()
+
+
+def test_invalid_arguments():
+    with pytest.raises(ValueError):
+        BoundedWorkerPool(max_workers=0, max_queue_size=0)
+    with pytest.raises(ValueError):
+        BoundedWorkerPool(max_workers=1, max_queue_size=-1)
+
+
+def test_saturated():
+    pool = BoundedWorkerPool(max_workers=1, max_queue_size=0)
+    release = threading.Event()
+
+    async def main():
+        blocked = asyncio.ensure_future(pool.run(release.wait, 5))
+        await asyncio.sleep(0.05)
+        with pytest.raises(WorkerPoolSaturated) as exc_info:
+            await pool.run(pow, 2, 2)
+        assert exc_info.value.status_code == 503
+        release.set()
+        await blocked
+        # slot is released again
+        assert await pool.run(pow, 2, 2) == 4
+
+    asyncio.run(main())
+    pool.shutdown()
+
+
+def test_cancelled_caller_keeps_slot():
+    pool = BoundedWorkerPool(max_workers=1, max_queue_size=0)
+    release = threading.Event()
+
+    async def main():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(pool.run(release.wait, 5), timeout=0.05)
+        # the job still runs in its worker, so the pool is still full
+        with pytest.raises(WorkerPoolSaturated):
+            await pool.run(pow, 2, 2)
+        release.set()
+        await asyncio.sleep(0.05)
+        assert await pool.run(pow, 2, 2) == 4
+
+    asyncio.run(main())
+    pool.shutdown()
@@ -0,0 +1,199 @@
+"""Stateless signed bearer tokens (JWT) for API clients.
+
+Tokens are JWTs signed with HMAC-SHA256 (`HS256`) or Ed25519 (`EdDSA`).
+They carry the user name and role names, so a request presenting a token is
+authenticated by a signature check alone, without database or session.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import time
+
+from fastapi import Request
+
+from .auth_config import AUTH_SETTINGS
+from .authenticator_registry import Authenticator
+from .cache import LRUCache
+from .typechecking import typechecked
+from .users import User
+
+
+class InvalidToken(Exception):
+    """Raised for malformed, forged or expired tokens."""
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+class TokenSigner:
+    """Issue and verify signed tokens.
+
+    Key material is parsed once at construction. Verified tokens are kept in
+    an LRU cache (until they expire), so a repeated token is not verified again.
+    """
+
+    @typechecked
+    def __init__(
+        self,
+        algorithm: str = "HS256",
+        secret_key: str | None = None,
+        private_key: str | None = None,
+        public_key: str | None = None,
+        lifetime: int = 3600,
+        cache_size: int = 1024,
+    ) -> None:
+        if algorithm == "HS256":
+            if not secret_key:
+                raise ValueError("HS256 tokens require a secret key")
+            self._hmac_key = secret_key.encode()
+        elif algorithm == "EdDSA":
+            # cryptography is only needed for Ed25519 tokens
+            from cryptography.hazmat.primitives.serialization import load_pem_private_key, load_pem_public_key
+
+            if not private_key and not public_key:
+                raise ValueError("EdDSA tokens require a private and/or public key")
+            self._private_key = load_pem_private_key(private_key.encode(), password=None) if private_key else None
+            if public_key:
+                self._public_key = load_pem_public_key(public_key.encode())
+            else:
+                self._public_key = self._private_key.public_key()
+        else:
+            raise ValueError(f"Unsupported token algorithm {algorithm}")
+
+        self.algorithm = algorithm
+        self.lifetime = lifetime
+        self.cache = LRUCache(maxsize=cache_size)
+        header = json.dumps({"alg": algorithm, "typ": "JWT"}, separators=(",", ":"))
+        self._header = _b64encode(header.encode())
+
+    def _sign(self, data: bytes) -> bytes:
+        if self.algorithm == "HS256":
+            return hmac.new(self._hmac_key, data, hashlib.sha256).digest()
+        if self._private_key is None:
+            raise ValueError("Issuing EdDSA tokens requires a private key")
+        return self._private_key.sign(data)
+
+    def _check_signature(self, data: bytes, signature: bytes) -> bool:
+        if self.algorithm == "HS256":
+            return hmac.compare_digest(self._sign(data), signature)
+        from cryptography.exceptions import InvalidSignature
+
+        try:
+            self._public_key.verify(signature, data)
+        except InvalidSignature:
+            return False
+        return True
+
+    @typechecked
+    def issue(self, user: User) -> str:
+        """Return a token for `user`."""
+        now = int(time.time())
+        claims = {
+            "sub": user.name,
+            "desc": user.description,
+            "roles": [role.name for role in user.roles],
+            "iat": now,
+            "exp": now + self.lifetime,
+        }
+        payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode())
+        signing_input = f"{self._header}.{payload}"
+        return f"{signing_input}.{_b64encode(self._sign(signing_input.encode()))}"
+
+    @typechecked
+    def verify(self, token: str) -> dict:
+        """Return the claims of `token`. Raise `InvalidToken` if it is not valid."""
+        try:
+            header, payload, signature = token.split(".")
+        except ValueError:
+            raise InvalidToken("Malformed token")
+        # only accept the configured algorithm
+        if header != self._header:
+            raise InvalidToken("Unexpected token header")
+        try:
+            valid = self._check_signature(f"{header}.{payload}".encode(), _b64decode(signature))
+            claims = json.loads(_b64decode(payload)) if valid else None
+        except ValueError:
+            raise InvalidToken("Malformed token")
+        if not valid:
+            raise InvalidToken("Invalid token signature")
+        if claims.get("exp", 0) < time.time():
+            raise InvalidToken("Token expired")
+        return claims
+
+    @typechecked
+    def user_from_token(self, token: str) -> User:
+        """Return the user of `token`. Raise `InvalidToken` if it is not valid."""
+        cached = self.cache.get(token)
+        if cached is not None:
+            expires, user = cached
+            if expires < time.time():
+                self.cache.pop(token)
+                raise InvalidToken("Token expired")
+            return user
+
+        claims = self.verify(token)
+        user = User.from_session_payload(
+            {
+                "name": claims["sub"],
+                "description": claims.get("desc", claims["sub"]),
+                "is_anonymous": False,
+                "roles": claims.get("roles", []),
+                "properties": {"source": "token", "expires": claims["exp"]},
+            }
+        )
+        self.cache.set(token, (claims["exp"], user))
+        return user
+
+
+_TOKEN_SIGNER: TokenSigner | None = None
+
+
+def get_token_signer() -> TokenSigner:
+    """Return the token signer configured by `AUTH_SETTINGS`, created on first use."""
+    global _TOKEN_SIGNER
+    if _TOKEN_SIGNER is None:
+        secret_key = AUTH_SETTINGS.token_secret_key or AUTH_SETTINGS.secret_key
+        private_key = AUTH_SETTINGS.token_private_key
+        _TOKEN_SIGNER = TokenSigner(
+            algorithm=AUTH_SETTINGS.token_algorithm,
+            secret_key=secret_key.get_secret_value(),
+            private_key=private_key.get_secret_value() if private_key else None,
+            public_key=AUTH_SETTINGS.token_public_key,
+            lifetime=AUTH_SETTINGS.token_lifetime,
+            cache_size=AUTH_SETTINGS.token_cache_size,
+        )
+    return _TOKEN_SIGNER
+
+
+def bearer_token(request: Request) -> str | None:
+    """Return the bearer token of the `Authorization` header, if any."""
+    authorization = request.headers.get("authorization")
+    if not authorization:
+        return None
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    return token.strip()
+
+
+class TokenAuthenticator(Authenticator):
+    """Authenticator for requests carrying a bearer token."""
+
+    name = "TokenAuthenticator"
+
+    @typechecked
+    async def authenticate(self, request: Request) -> User | None:
+        token = bearer_token(request)
+        if token is None:
+            return None
+        try:
+            return get_token_signer().user_from_token(token)
+        except InvalidToken:
+            return None
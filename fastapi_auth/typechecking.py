@@ -0,0 +1,44 @@
+"""Runtime type checks with typeguard, instrumented on first call."""
+
+import functools
+import inspect
+from collections.abc import Callable
+from typing import TypeVar
+
+import typeguard
+
+F = TypeVar("F", bound=Callable)
+
+
+def typechecked(func: F) -> F:
+    """Like `typeguard.typechecked`, but instrument `func` on its first call.
+
+    typeguard parses and recompiles the source of the module for every
+    decorated function; doing that at import time made up most of the startup
+    time of the CLI and of the workers. Generator functions are instrumented
+    right away.
+    """
+    if not __debug__ or inspect.isgeneratorfunction(func) or inspect.isasyncgenfunction(func):
+        return typeguard.typechecked(func)
+
+    instrumented = None
+
+    def instrument() -> Callable:
+        nonlocal instrumented
+        if instrumented is None:
+            instrumented = typeguard.typechecked(func)
+        return instrumented
+
+    if inspect.iscoroutinefunction(func):
+
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            return await instrument()(*args, **kwargs)
+
+    else:
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return instrument()(*args, **kwargs)
+
+    return wrapper
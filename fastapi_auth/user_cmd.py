@@ -1,24 +1,54 @@
 """Command line interface for user management."""
 
+import csv
+import json
+import os
+import sys
+from collections.abc import Iterable, Iterator
+from contextlib import nullcontext
+from itertools import islice
+from pathlib import Path
+from typing import TYPE_CHECKING, Annotated
+
 import typer
 
 from .logger import LOG
 from .auth_config import AUTH_SETTINGS
-from rich.table import Table
-from rich.console import Console
 
+# rich, SQLModel and the password hashers are imported by the commands
+# needing them, `--help` and typos stay fast
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
 
-# from .user_management import UserManagement
-from .user_management_sqlobject import UserManagement
+    from .user_management_sqlobject import UserManagement
 
 
 app = typer.Typer()
 
 
-def get_user_management() -> UserManagement:
-    """Get a UserManagement instance."""
-    LOG.debug(f"Using database {AUTH_SETTINGS.db_uri}")
-    return UserManagement(AUTH_SETTINGS.db_uri)
+# session store whose sessions are revoked by the commands, see get_user_management()
+_SESSION_STORE = None
+
+
+def get_user_management() -> "UserManagement":
+    """Get a UserManagement instance.
+
+    With the "sql" session backend, deleting users and changing passwords
+    revokes their sessions; the sessions of other backends live in the
+    application's processes (memory) or in a store unknown to this command
+    (Redis).
+    """
+    global _SESSION_STORE
+    from .user_management_sqlobject import UserManagement
+
+    LOG.debug("Using database {}", AUTH_SETTINGS.db_uri)
+    um = UserManagement(AUTH_SETTINGS.db_uri)
+    if AUTH_SETTINGS.session_backend == "sql":
+        from .session_store import SQLSessionStore, register_session_store
+
+        _SESSION_STORE = SQLSessionStore(ttl=AUTH_SETTINGS.session_ttl, db_uri=AUTH_SETTINGS.db_uri)
+        register_session_store(_SESSION_STORE)
+    return um
 
 
 @app.command()
@@ -26,15 +56,16 @@ def add(username: str, password: str, roles: str) -> None:
     """Add a user to the database."""
     um = get_user_management()
     um.add_user(username, password, roles)
-    LOG.debug(f"Added user {username} with roles {roles}")
+    LOG.debug("Added user {} with roles {}", username, roles)
 
 
 @app.command()
-def delete(user: str) -> None:
-    """Delete a user from the database."""
+def delete(users: list[str]) -> None:
+    """Delete users from the database (all or none)."""
     um = get_user_management()
-    um.delete_user(user)
-    LOG.debug(f"Deleted user {user}")
+    um.delete_users(users)
+    for user in users:
+        LOG.debug("Deleted user {}", user)
 
 
 @app.command()
@@ -42,7 +73,7 @@ def set_password(user: str, password: str) -> None:
     """Set the password for a user."""
     um = get_user_management()
     um.change_password(user, password)
-    LOG.debug(f"Changed password for user {user}")
+    LOG.debug("Changed password for user {}", user)
 
 
 @app.command()
@@ -56,19 +87,163 @@ def verify_password(user: str, password: str) -> None:
 
 
 @app.command()
-def list_users() -> None:
-    """List all users in the database."""
+def list_users(
+    limit: int = typer.Option(None, help="Show at most this many users"),
+    offset: int = typer.Option(0, help="Skip this many users"),
+    role: str = typer.Option(None, help="Only users having this role"),
+    prefix: str = typer.Option(None, help="Only users whose name starts with this prefix"),
+    format: str = typer.Option("table", help="table or json"),
+    batch_size: int = typer.Option(1000, help="Users fetched (and table rows printed) at once"),
+) -> None:
+    """List the users in the database, ordered by name."""
+    if format not in ("table", "json"):
+        raise typer.BadParameter(f"Unknown format {format}")
     um = get_user_management()
-    users = um.get_users()
-
+    users = um.iter_users(batch_size=batch_size, role=role, prefix=prefix)
+    users = islice(users, offset, offset + limit if limit is not None else None)
+
+    if format == "json":
+        # a JSON array, written user by user
+        separator = "["
+        for user in users:
+            record = {"username": user.username, "roles": user.roles.split(","), "created": user.created.isoformat()}
+            sys.stdout.write(f"{separator}\n{json.dumps(record)}")
+            separator = ","
+        sys.stdout.write("[]\n" if separator == "[" else "\n]\n")
+        return
+
+    from rich.console import Console
+    from rich.table import Table
+
+    # one table per batch of users
     console = Console()
-    table = Table(show_header=True, header_style="bold magenta")
-    table.add_column("Name")
-    table.add_column("Role")
-    table.add_column("Created")
-    for user in users:
-        table.add_row(user.username, user.roles, user.created.isoformat())
-    console.print(table)
+    while page := list(islice(users, batch_size)):
+        table = Table(show_header=True, header_style="bold magenta")
+        table.add_column("Name")
+        table.add_column("Role")
+        table.add_column("Created")
+        for user in page:
+            table.add_row(user.username, user.roles, user.created.isoformat())
+        console.print(table)
+
+
+@app.command()
+def migrate_roles() -> None:
+    """Reconcile the user_roles table with the roles column (for databases of older versions)."""
+    um = get_user_management()
+    changed = um.migrate_roles()
+    LOG.debug("Updated {} user roles", changed)
+    typer.echo(f"Updated {changed} user roles.")
+
+
+def _file_format(path: Path, format: str | None) -> str:
+    format = format or ("jsonl" if path.suffix in (".jsonl", ".json") else "csv")
+    if format not in ("csv", "jsonl"):
+        raise typer.BadParameter(f"Unknown format {format}")
+    return format
+
+
+def read_users(lines: Iterable[str], format: str) -> Iterator[dict]:
+    """Yield users (`username`, `roles` and `password` or `password_hash`)
+    from CSV or JSONL lines. Roles are comma separated or (JSONL) a list."""
+    if format == "csv":
+        records = csv.DictReader(lines)
+    else:
+        records = (json.loads(line) for line in lines if line.strip())
+    for record in records:
+        roles = record.get("roles") or ""
+        if not isinstance(roles, str):
+            roles = ",".join(roles)
+        yield {
+            "username": record["username"],
+            "roles": roles,
+            "password": record.get("password") or None,
+            "password_hash": record.get("password_hash") or None,
+        }
+
+
+def hash_users(records: list[dict], executor: "ProcessPoolExecutor | None") -> list[dict]:
+    """Return the users with password hashes, hashing plain passwords in `executor`."""
+    from .password_hashers import get_verifier
+    from .user_management_sqlobject import hash_password
+
+    for record in records:
+        password_hash = record["password_hash"]
+        if password_hash is not None and not get_verifier(password_hash).identifies(password_hash):
+            raise ValueError(f"Unsupported password hash for user {record['username']}")
+        if password_hash is None and record["password"] is None:
+            raise ValueError(f"No password for user {record['username']}")
+    plain = [record["password"] for record in records if record["password_hash"] is None]
+    hashes = iter(executor.map(hash_password, plain) if executor else map(hash_password, plain))
+    return [
+        {
+            "username": record["username"],
+            "password": record["password_hash"] or next(hashes),
+            "roles": record["roles"],
+        }
+        for record in records
+    ]
+
+
+@app.command("import")
+def import_users(
+    filename: Path,
+    format: str = typer.Option(None, help="csv or jsonl (default: from the file extension)"),
+    batch_size: int = typer.Option(1000, help="Users per transaction"),
+    workers: int = typer.Option(os.cpu_count() or 1, help="Processes for password hashing"),
+    skip_existing: bool = typer.Option(False, help="Skip existing users instead of failing"),
+) -> None:
+    """Import users from a CSV or JSONL file.
+
+    Records have `username`, `roles` and either a plain `password` or a
+    `password_hash` (e.g. from `export`).
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    from rich.console import Console
+    from rich.progress import Progress
+
+    um = get_user_management()
+    format = _file_format(filename, format)
+    executor = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    added = 0
+    try:
+        with open(filename, newline="") as fp, Progress(console=Console(stderr=True)) as progress:
+            task = progress.add_task("Importing users", total=None)
+            records = read_users(fp, format)
+            while batch := list(islice(records, batch_size)):
+                added += um.add_hashed_users(hash_users(batch, executor), skip_existing=skip_existing)
+                progress.advance(task, len(batch))
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    LOG.debug("Imported {} users from {}", added, filename)
+    typer.echo(f"Imported {added} users.", err=True)
+
+
+@app.command("export")
+def export_users(
+    filename: Annotated[Path | None, typer.Argument(help="Output file (default: standard output)")] = None,
+    format: str = typer.Option(None, help="csv or jsonl (default: from the file extension)"),
+) -> None:
+    """Export all users, including password hashes, as CSV or JSONL."""
+    um = get_user_management()
+    format = _file_format(filename or Path("-"), format)
+    with open(filename, "w", newline="") if filename else nullcontext(sys.stdout) as fp:
+        if format == "csv":
+            writer = csv.writer(fp)
+            writer.writerow(["username", "roles", "password_hash", "created"])
+        for user in um.iter_users():
+            if format == "csv":
+                writer.writerow([user.username, user.roles, user.password, user.created.isoformat()])
+            else:
+                record = {
+                    "username": user.username,
+                    "roles": user.roles.split(","),
+                    "password_hash": user.password,
+                    "created": user.created.isoformat(),
+                }
+                fp.write(json.dumps(record) + "\n")
 
 
 def main() -> None:
@@ -0,0 +1,190 @@
+"""Async counterpart of `UserManagement` on top of an async SQLAlchemy engine.
+
+Requires an async database driver, e.g. `aiosqlite` for SQLite
+(`pip install zopyx-fastapi-auth[async]`).
+"""
+
+import threading
+from collections.abc import Sequence
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import NullPool
+from sqlmodel import SQLModel, delete, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .auth_config import AUTH_SETTINGS
+from .engines import apply_sqlite_tuning, engine_options
+from .logger import LOG
+from .metrics import DB_LOOKUP_SECONDS
+from .session_store import revoke_user_sessions
+from .typechecking import typechecked
+from .user_management_sqlobject import (
+    User,
+    UserRole,
+    check_password,
+    dummy_hash,
+    hash_password,
+    needs_rehash,
+    user_caches,
+    user_roles,
+)
+from .worker_pool import HASH_POOL
+
+_ASYNC_ENGINES: dict[str, AsyncEngine] = {}
+_LOCK = threading.Lock()
+
+# async drivers used for database URIs without an explicit driver
+_ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+
+
+@typechecked
+def to_async_uri(db_uri: str) -> str:
+    """Return the async variant of `db_uri`, e.g. `sqlite+aiosqlite:///users.db`."""
+    url = make_url(db_uri)
+    drivername = _ASYNC_DRIVERS.get(url.drivername)
+    if drivername is None:
+        return db_uri
+    return url.set(drivername=drivername).render_as_string(hide_password=False)
+
+
+@typechecked
+async def get_async_engine(db_uri: str) -> AsyncEngine:
+    """Return the shared async engine for `db_uri` (an async URI, see `to_async_uri()`).
+
+    The schema is created when the engine is created.
+    """
+    engine = _ASYNC_ENGINES.get(db_uri)
+    if engine is not None:
+        return engine
+
+    LOG.info("Connecting to database {} (async)", db_uri)
+    if make_url(db_uri).get_backend_name() == "sqlite":
+        # SQLite connections are cheap to open, and pooled aiosqlite
+        # connections must not be shared between event loops
+        engine = create_async_engine(db_uri, poolclass=NullPool)
+        if AUTH_SETTINGS.sqlite_tuning:
+            apply_sqlite_tuning(engine.sync_engine)
+    else:
+        engine = create_async_engine(db_uri, **engine_options(db_uri))
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+
+    with _LOCK:
+        existing = _ASYNC_ENGINES.setdefault(db_uri, engine)
+    if existing is not engine:
+        await engine.dispose()
+    return existing
+
+
+@typechecked
+async def dispose_async_engine(db_uri: str) -> None:
+    """Close all pooled connections of the async engine for `db_uri` and forget it."""
+    with _LOCK:
+        engine = _ASYNC_ENGINES.pop(db_uri, None)
+    if engine is not None:
+        await engine.dispose()
+
+
+class AsyncUserManagement:
+    """Class for managing users in a SQL database without blocking the event loop.
+
+    Database I/O runs on the async engine, password hashing in `HASH_POOL`.
+    The lookup caches are shared with `UserManagement` on the same database.
+    """
+
+    @typechecked
+    def __init__(self, db_uri: str) -> None:
+        # plain URIs like sqlite:///users.db are mapped to their async driver
+        self.db_uri = to_async_uri(db_uri)
+        self.caches = user_caches(self.db_uri)
+
+    async def _session(self) -> AsyncSession:
+        return AsyncSession(await get_async_engine(self.db_uri), expire_on_commit=False)
+
+    @typechecked
+    async def add_user(self, username: str, password: str, roles: str) -> None:
+        if await self.has_user(username):
+            raise ValueError(f"User {username} already exists.")
+        hashed_password = await HASH_POOL.run(hash_password, password)
+        user = User(username=username, password=hashed_password, roles=roles)
+        async with await self._session() as session:
+            session.add(user)
+            session.add_all(user_roles(username, roles))
+            await session.commit()
+        self.caches.users_added(username)
+
+    @typechecked
+    async def delete_user(self, username: str) -> None:
+        async with await self._session() as session:
+            user = await session.get(User, username)
+            if user is None:
+                raise ValueError(f"User {username} does not exist.")
+            await session.exec(delete(UserRole).where(UserRole.username == username))
+            await session.delete(user)
+            await session.commit()
+        self.caches.users_changed(username)
+        await revoke_user_sessions(username)
+
+    @typechecked
+    async def get_user(self, username: str, password: str) -> dict | None:
+        user_data = self.caches.get_verified(username, password)
+        if user_data is not None:
+            return user_data
+
+        # unknown users cost a password check as well, no timing oracle
+        if username in self.caches.missing_users:
+            await HASH_POOL.run(check_password, password, dummy_hash())
+            return None
+        with DB_LOOKUP_SECONDS.time():
+            async with await self._session() as session:
+                user = await session.get(User, username)
+        if user is None:
+            self.caches.missing_users.set(username, True)
+            await HASH_POOL.run(check_password, password, dummy_hash())
+            return None
+        if await HASH_POOL.run(check_password, password, user.password):
+            user_data = {"username": user.username, "roles": user.roles.split(",")}
+            if needs_rehash(user.password):
+                # replace an outdated hash after a successful login
+                user.password = await HASH_POOL.run(hash_password, password)
+                async with await self._session() as session:
+                    session.add(user)
+                    await session.commit()
+            self.caches.set_verified(username, password, user_data)
+            return user_data
+        return None
+
+    async def get_users(self) -> Sequence[User]:
+        async with await self._session() as session:
+            return (await session.exec(select(User))).all()
+
+    @typechecked
+    async def has_user(self, username: str) -> bool:
+        async with await self._session() as session:
+            return await session.get(User, username) is not None
+
+    @typechecked
+    async def change_password(self, username: str, new_password: str) -> None:
+        hashed_password = await HASH_POOL.run(hash_password, new_password)
+        async with await self._session() as session:
+            user = await session.get(User, username)
+            if user is None:
+                raise ValueError(f"User {username} does not exist.")
+            user.password = hashed_password
+            session.add(user)
+            await session.commit()
+        self.caches.users_changed(username)
+        await revoke_user_sessions(username)
+
+    @typechecked
+    async def verify_password(self, username: str, password: str) -> bool:
+        async with await self._session() as session:
+            user = await session.get(User, username)
+        if user is None:
+            raise ValueError(f"User {username} does not exist.")
+        return await HASH_POOL.run(check_password, password, user.password)
@@ -1,15 +1,28 @@
 """Module for managing users in a SQLite database."""
 
+import hashlib
+import hmac
+import threading
+import weakref
+from collections.abc import Iterable, Iterator
 from datetime import datetime, timedelta, timezone
+from functools import cached_property
+from itertools import islice
 
-import bcrypt
 from fastapi import Request
-from sqlmodel import Field, Session, SQLModel, create_engine, select
-from typeguard import typechecked
+from sqlalchemy.engine import Engine, make_url
+from sqlmodel import Field, Session, SQLModel, delete, func, select
+from .typechecking import typechecked
 from .authenticator_registry import Authenticator
 from .auth_config import AUTH_SETTINGS
-from .roles import ROLES_REGISTRY
+from .cache import LRUCache
+from .engines import get_engine
 from .logger import LOG
+from .metrics import DB_LOOKUP_SECONDS, PASSWORD_VERIFY_SECONDS
+from .password_hashers import get_password_hasher, get_verifier
+from .roles import ROLES_REGISTRY
+from .session_store import revoke_sessions
+from .worker_pool import HASH_POOL
 
 # AuthUser is an alias in order to avoid name clash with the SQLModel User class below
 from .users import User as AuthUser
@@ -21,6 +34,119 @@ def utc_now():
     return datetime.now(timezone.utc)
 
 
+def hash_password(password: str) -> str:
+    """Return the hash of `password` (configured password hasher)."""
+    return get_password_hasher().hash(password)
+
+
+def check_password(password: str, hashed_password: str) -> bool:
+    """Check `password` against a hash of any supported algorithm."""
+    verifier = get_verifier(hashed_password)
+    with PASSWORD_VERIFY_SECONDS.time(algorithm=verifier.name):
+        return verifier.verify(password, hashed_password)
+
+
+def needs_rehash(hashed_password: str) -> bool:
+    """Check if a hash uses another algorithm or cost than the configured hasher."""
+    return get_password_hasher().needs_rehash(hashed_password)
+
+
+def dummy_hash() -> str:
+    """Return a hash checked for unknown users, so that their logins take as
+    long as those of existing users."""
+    return get_password_hasher().dummy_hash
+
+
+def credential_key(username: str, password: str) -> str:
+    """Return a keyed hash (HMAC with the secret key) of username and password."""
+    key = AUTH_SETTINGS.secret_key.get_secret_value().encode()
+    message = f"{len(username)}:{username}{password}".encode()
+    return hmac.new(key, message, hashlib.sha256).hexdigest()
+
+
+def _batched(iterable: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+# maximum number of values in one IN (...) clause, databases limit the
+# number of bound parameters (older SQLite versions to 999)
+IN_CHUNK_SIZE = 500
+
+
+class UserCaches:
+    """Lookup caches of one database, shared by `UserManagement` and
+    `AsyncUserManagement` instances (see `user_caches()`). The caches are
+    created on first use."""
+
+    @cached_property
+    def missing_users(self) -> LRUCache:
+        """Usernames not found in the database; entries expire in case users
+        are added by another process."""
+        return LRUCache(maxsize=AUTH_SETTINGS.negative_cache_size, ttl=AUTH_SETTINGS.negative_cache_ttl)
+
+    @cached_property
+    def verified_credentials(self) -> LRUCache:
+        """Successful `get_user()` results keyed by `credential_key()`, only
+        used if `AUTH_SETTINGS.credential_cache_ttl` is set."""
+        return LRUCache(maxsize=AUTH_SETTINGS.credential_cache_size, ttl=AUTH_SETTINGS.credential_cache_ttl)
+
+    def get_verified(self, username: str, password: str) -> dict | None:
+        """Return the cached result of a successful `get_user()`, if any."""
+        if AUTH_SETTINGS.credential_cache_ttl <= 0:
+            return None
+        user_data = self.verified_credentials.get(credential_key(username, password))
+        if user_data is None:
+            return None
+        return {"username": user_data["username"], "roles": list(user_data["roles"])}
+
+    def set_verified(self, username: str, password: str, user_data: dict) -> None:
+        """Cache the result of a successful `get_user()`."""
+        if AUTH_SETTINGS.credential_cache_ttl > 0:
+            self.verified_credentials.set(
+                credential_key(username, password),
+                {"username": user_data["username"], "roles": tuple(user_data["roles"])},
+            )
+
+    def users_added(self, *usernames: str) -> None:
+        """Forget that `usernames` did not exist."""
+        for username in usernames:
+            self.missing_users.pop(username)
+
+    def users_changed(self, *usernames: str) -> None:
+        """Drop the cached verified credentials of `usernames` (changed passwords
+        or roles, deleted users)."""
+        usernames = set(usernames)
+        for key, user_data in self.verified_credentials.items():
+            if user_data["username"] in usernames:
+                self.verified_credentials.pop(key)
+
+
+_USER_CACHES: dict[str, UserCaches] = {}
+
+
+def database_key(db_uri: str) -> str:
+    """Return `db_uri` without its driver, the same for sync and async URIs of a database."""
+    url = make_url(db_uri)
+    return url.set(drivername=url.get_backend_name()).render_as_string(hide_password=False)
+
+
+def user_caches(db_uri: str) -> UserCaches:
+    """Return the lookup caches of the database `db_uri`."""
+    key = database_key(db_uri)
+    caches = _USER_CACHES.get(key)
+    if caches is None:
+        caches = _USER_CACHES.setdefault(key, UserCaches())
+    return caches
+
+
+def clear_user_caches() -> None:
+    """Forget the lookup caches of all databases."""
+    _USER_CACHES.clear()
+    _ROLES_RECONCILED.clear()
+
+
 class User(SQLModel, table=True):
     username: str = Field(primary_key=True)
     password: str
@@ -28,24 +154,191 @@ class User(SQLModel, table=True):
     created: datetime = Field(default_factory=utc_now)
 
 
+class UserRole(SQLModel, table=True):
+    """Role of a user (normalised copy of `User.roles`, indexed by role)."""
+
+    __tablename__ = "user_roles"
+
+    username: str = Field(foreign_key="user.username", primary_key=True)
+    role: str = Field(primary_key=True, index=True)
+
+
+# engines whose user_roles table was checked against the roles column
+_ROLES_RECONCILED: "weakref.WeakSet[Engine]" = weakref.WeakSet()
+_ROLES_LOCK = threading.Lock()
+
+
+def role_names(roles: str) -> list[str]:
+    """Split a comma separated roles string (as stored in `User.roles`)."""
+    return list(dict.fromkeys(role for role in roles.split(",") if role))
+
+
+def user_roles(username: str, roles: str) -> list[UserRole]:
+    """Return the `UserRole` rows for a user."""
+    return [UserRole(username=username, role=role) for role in role_names(roles)]
+
+
 class UserManagement:
-    """Class for managing users in a SQL database."""
+    """Class for managing users in a SQL database.
+
+    Deleting users and changing passwords or roles revokes the users' sessions
+    in the registered session stores (see
+    `session_store.register_session_store()`).
+    """
 
     @typechecked
     def __init__(self, db_uri: str) -> None:
-        LOG.info(f"Connecting to database {db_uri}")
-        self.engine = create_engine(db_uri)
-        SQLModel.metadata.create_all(self.engine)
+        # engines are shared per database URI, constructing this is cheap
+        self.engine = get_engine(db_uri)
+        self.caches = user_caches(db_uri)
+
+    @property
+    def missing_users(self) -> LRUCache:
+        """Negative cache of usernames not found in the database.
+
+        Shared by all instances for the same database. `add_user()` removes
+        the username, entries expire after `AUTH_SETTINGS.negative_cache_ttl`
+        seconds in case users are added by another process.
+        """
+        return self.caches.missing_users
+
+    @property
+    def verified_credentials(self) -> LRUCache:
+        """Cache of successful `get_user()` results, keyed by `credential_key()`.
+
+        Shared by all instances for the same database. Only used if
+        `AUTH_SETTINGS.credential_cache_ttl` is set. `change_password()` and
+        `delete_user()` drop the entries of the user.
+        """
+        return self.caches.verified_credentials
+
+    def forget_credentials(self, *usernames: str) -> None:
+        """Drop the cached verified credentials of `usernames`."""
+        self.caches.users_changed(*usernames)
+
+    def _existing_usernames(self, session: Session, usernames: Iterable[str]) -> set[str]:
+        """Return those of `usernames` existing in the database (one query per chunk)."""
+        existing = set()
+        for chunk in _batched(usernames, IN_CHUNK_SIZE):
+            existing.update(session.exec(select(User.username).where(User.username.in_(chunk))).all())
+        return existing
+
+    def _get_users(self, session: Session, usernames: list[str]) -> list[User]:
+        """Return the users `usernames`, raise `ValueError` if any does not exist."""
+        users = []
+        for chunk in _batched(usernames, IN_CHUNK_SIZE):
+            users.extend(session.exec(select(User).where(User.username.in_(chunk))).all())
+        missing = set(usernames) - {user.username for user in users}
+        if missing:
+            raise ValueError(f"Users {', '.join(sorted(missing))} do not exist.")
+        return users
 
     @typechecked
     def add_user(self, username: str, password: str, roles: str) -> None:
         if self.has_user(username):
             raise ValueError(f"User {username} already exists.")
-        hashed_password = bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+        hashed_password = hash_password(password)
         user = User(username=username, password=hashed_password, roles=roles)
         with Session(self.engine) as session:
             session.add(user)
+            session.add_all(user_roles(username, roles))
+            session.commit()
+        self.caches.users_added(username)
+
+    @typechecked
+    def add_hashed_users(self, users: list[dict], skip_existing: bool = False) -> int:
+        """Add users with already hashed passwords in a single transaction.
+
+        `users` are dicts with `username`, `password` (the hash) and `roles`.
+        If any user exists already, nothing is added and `ValueError` is raised,
+        unless `skip_existing` is set. Return the number of added users.
+        """
+        usernames = [user["username"] for user in users]
+        if len(set(usernames)) != len(usernames):
+            raise ValueError("Duplicate usernames in batch.")
+        with Session(self.engine) as session:
+            existing = self._existing_usernames(session, usernames)
+            if existing and not skip_existing:
+                raise ValueError(f"Users {', '.join(sorted(existing))} already exist.")
+            added = [username for username in usernames if username not in existing]
+            for user in users:
+                if user["username"] not in existing:
+                    session.add(User(username=user["username"], password=user["password"], roles=user["roles"]))
+                    session.add_all(user_roles(user["username"], user["roles"]))
+            session.commit()
+        self.caches.users_added(*added)
+        return len(added)
+
+    @typechecked
+    def add_users(self, users: list[dict]) -> None:
+        """Add users in a single transaction.
+
+        `users` are dicts with `username`, `password` and `roles` (like the
+        arguments of `add_user()`). If any user exists already, nothing is
+        added and `ValueError` is raised.
+        """
+        with Session(self.engine) as session:
+            # fail before spending time on hashing
+            existing = self._existing_usernames(session, (user["username"] for user in users))
+        if existing:
+            raise ValueError(f"Users {', '.join(sorted(existing))} already exist.")
+        self.add_hashed_users(
+            [
+                {"username": user["username"], "password": hash_password(user["password"]), "roles": user["roles"]}
+                for user in users
+            ]
+        )
+
+    @typechecked
+    def delete_users(self, usernames: list[str]) -> None:
+        """Delete users in a single transaction. If any user does not exist,
+        nothing is deleted and `ValueError` is raised."""
+        usernames = list(dict.fromkeys(usernames))
+        with Session(self.engine) as session:
+            self._get_users(session, usernames)
+            for chunk in _batched(usernames, IN_CHUNK_SIZE):
+                session.exec(delete(UserRole).where(UserRole.username.in_(chunk)))
+                session.exec(delete(User).where(User.username.in_(chunk)))
+            session.commit()
+        self.forget_credentials(*usernames)
+        revoke_sessions(*usernames)
+
+    @typechecked
+    def set_roles_many(self, roles: dict[str, str]) -> None:
+        """Replace the roles of users (username -> comma separated roles) in a
+        single transaction. If any user does not exist, nothing is changed and
+        `ValueError` is raised."""
+        usernames = list(roles)
+        with Session(self.engine) as session:
+            for user in self._get_users(session, usernames):
+                user.roles = roles[user.username]
+                session.add(user)
+            for chunk in _batched(usernames, IN_CHUNK_SIZE):
+                session.exec(delete(UserRole).where(UserRole.username.in_(chunk)))
+            for username in usernames:
+                session.add_all(user_roles(username, roles[username]))
+            session.commit()
+        self.forget_credentials(*usernames)
+        # sessions hold the role names of the user
+        revoke_sessions(*usernames)
+
+    @typechecked
+    def change_passwords(self, passwords: dict[str, str]) -> None:
+        """Change the passwords of users (username -> new password) in a single
+        transaction. If any user does not exist, nothing is changed and
+        `ValueError` is raised."""
+        with Session(self.engine) as session:
+            # fail before spending time on hashing
+            self._get_users(session, list(passwords))
+        # hash outside of the session, so no connection is held meanwhile
+        hashed = {username: hash_password(password) for username, password in passwords.items()}
+        with Session(self.engine) as session:
+            for user in self._get_users(session, list(hashed)):
+                user.password = hashed[user.username]
+                session.add(user)
             session.commit()
+        self.forget_credentials(*passwords)
+        revoke_sessions(*passwords)
 
     @typechecked
     def delete_user(self, username: str) -> None:
@@ -53,23 +346,139 @@ class UserManagement:
             user = session.get(User, username)
             if user is None:
                 raise ValueError(f"User {username} does not exist.")
+            session.exec(delete(UserRole).where(UserRole.username == username))
             session.delete(user)
             session.commit()
+        self.forget_credentials(username)
+        revoke_sessions(username)
 
     @typechecked
     def get_user(self, username: str, password: str) -> dict | None:
-        with Session(self.engine) as session:
+        user_data = self.caches.get_verified(username, password)
+        if user_data is not None:
+            return user_data
+
+        # unknown users cost a password check as well, no timing oracle
+        if username in self.missing_users:
+            check_password(password, dummy_hash())
+            return None
+        with DB_LOOKUP_SECONDS.time(), Session(self.engine) as session:
             user = session.get(User, username)
-            if user is None:
-                return None
-            if bcrypt.checkpw(password.encode(), user.password.encode()):
-                return {"username": user.username, "roles": user.roles.split(",")}
+        if user is None:
+            self.missing_users.set(username, True)
+            check_password(password, dummy_hash())
             return None
+        if check_password(password, user.password):
+            user_data = {"username": user.username, "roles": user.roles.split(",")}
+            if needs_rehash(user.password):
+                self._rehash(user, password)
+            self.caches.set_verified(username, password, user_data)
+            return user_data
+        return None
+
+    def _rehash(self, user: User, password: str) -> None:
+        """Replace an outdated hash after a successful login."""
+        user.password = hash_password(password)
+        with Session(self.engine) as session:
+            session.add(user)
+            session.commit()
 
     def get_users(self):
         with Session(self.engine) as session:
             return session.exec(select(User)).all()
 
+    @typechecked
+    def iter_users(self, batch_size: int = 1000, role: str | None = None, prefix: str | None = None) -> Iterator[User]:
+        """Yield users ordered by username, optionally only those having `role`
+        or whose name starts with `prefix`.
+
+        Users are fetched in batches of `batch_size` (keyset pagination on the
+        username), so memory use does not depend on the number of users.
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size must be positive")
+        query = select(User).order_by(User.username).limit(batch_size)
+        if role is not None:
+            self._ensure_user_roles()
+            query = query.where(
+                select(UserRole).where(UserRole.username == User.username, UserRole.role == role).exists()
+            )
+        if prefix:
+            query = query.where(User.username.startswith(prefix, autoescape=True))
+        last_username = None
+        while True:
+            page = query if last_username is None else query.where(User.username > last_username)
+            with Session(self.engine) as session:
+                users = session.exec(page).all()
+            yield from users
+            if len(users) < batch_size:
+                return
+            last_username = users[-1].username
+
+    @typechecked
+    def users_with_role(self, role: str) -> list[str]:
+        """Return the names of all users having `role`, ordered by name."""
+        self._ensure_user_roles()
+        query = select(UserRole.username).where(UserRole.role == role).order_by(UserRole.username)
+        with Session(self.engine) as session:
+            return list(session.exec(query).all())
+
+    def count_by_role(self) -> dict[str, int]:
+        """Return the number of users per role."""
+        self._ensure_user_roles()
+        query = select(UserRole.role, func.count()).group_by(UserRole.role).order_by(UserRole.role)
+        with Session(self.engine) as session:
+            return dict(session.exec(query).all())
+
+    def _ensure_user_roles(self) -> None:
+        """Reconcile `user_roles` with the `roles` column on first use of the
+        database in this process, if users without role rows or role rows
+        without users are found (databases of older versions)."""
+        if self.engine in _ROLES_RECONCILED:
+            return
+        with _ROLES_LOCK:
+            if self.engine in _ROLES_RECONCILED:
+                return
+            has_rows = select(UserRole).where(UserRole.username == User.username).exists()
+            has_user = select(User).where(User.username == UserRole.username).exists()
+            with Session(self.engine) as session:
+                unmigrated = session.exec(select(User.username).where(User.roles != "", ~has_rows).limit(1)).first()
+                orphaned = session.exec(select(UserRole.username).where(~has_user).limit(1)).first()
+            if unmigrated is not None or orphaned is not None:
+                LOG.info("Reconciling user_roles with the roles column")
+                self.migrate_roles()
+            _ROLES_RECONCILED.add(self.engine)
+
+    @typechecked
+    def migrate_roles(self, batch_size: int = 1000) -> int:
+        """Reconcile the `user_roles` table with the `roles` column of the users.
+
+        Missing rows are added, rows of roles a user no longer has and of
+        deleted users are removed, so it is safe to run again. Done
+        automatically on first use if users without any rows are found; run
+        it after older versions changed roles. Return the number of added
+        and removed rows.
+        """
+        changed = 0
+        for batch in _batched(self.iter_users(batch_size=batch_size), batch_size):
+            usernames = [user.username for user in batch]
+            expected = {(row.username, row.role) for user in batch for row in user_roles(user.username, user.roles)}
+            with Session(self.engine) as session:
+                existing = set()
+                for chunk in _batched(usernames, IN_CHUNK_SIZE):
+                    query = select(UserRole.username, UserRole.role).where(UserRole.username.in_(chunk))
+                    existing.update(session.exec(query).all())
+                for username, role in existing - expected:
+                    session.exec(delete(UserRole).where(UserRole.username == username, UserRole.role == role))
+                session.add_all(UserRole(username=username, role=role) for username, role in expected - existing)
+                session.commit()
+            changed += len(existing ^ expected)
+        has_user = select(User).where(User.username == UserRole.username).exists()
+        with Session(self.engine) as session:
+            changed += session.exec(delete(UserRole).where(~has_user)).rowcount
+            session.commit()
+        return changed
+
     @typechecked
     def has_user(self, username: str) -> bool:
         with Session(self.engine) as session:
@@ -81,10 +490,11 @@ class UserManagement:
             user = session.get(User, username)
             if user is None:
                 raise ValueError(f"User {username} does not exist.")
-            hashed_password = bcrypt.hashpw(new_password.encode(), bcrypt.gensalt()).decode()
-            user.password = hashed_password
+            user.password = hash_password(new_password)
             session.add(user)
             session.commit()
+        self.forget_credentials(username)
+        revoke_sessions(username)
 
     @typechecked
     def verify_password(self, username: str, password: str) -> bool:
@@ -92,7 +502,7 @@ class UserManagement:
             user = session.get(User, username)
             if user is None:
                 raise ValueError(f"User {username} does not exist.")
-            return bcrypt.checkpw(password.encode(), user.password.encode())
+            return check_password(password, user.password)
 
 
 @typechecked
@@ -103,8 +513,16 @@ async def get_user_from_fastapi_request(request: Request) -> AuthUser | None:
     username = str(form["username"])
     password = str(form["password"])
 
-    um = UserManagement(AUTH_SETTINGS.db_uri)
-    user_data = um.get_user(username, password)
+    if AUTH_SETTINGS.async_db:
+        # imported here, the async module depends on this one
+        from .user_management_async import AsyncUserManagement
+
+        aum = AsyncUserManagement(AUTH_SETTINGS.async_db_uri or AUTH_SETTINGS.db_uri)
+        user_data = await aum.get_user(username, password)
+    else:
+        um = UserManagement(AUTH_SETTINGS.db_uri)
+        # password hashing is slow by design, keep it off the event loop
+        user_data = await HASH_POOL.run(um.get_user, username, password)
     if user_data is None:
         return None
 
@@ -130,7 +548,7 @@ async def get_user_from_fastapi_request(request: Request) -> AuthUser | None:
 @typechecked
 def authenticate_user_for_fastapi(user: AuthUser, request: Request) -> None:
     """Authenticate the user for a FastAPI request by assigning the user to the session."""
-    request.session["user"] = user.model_dump(exclude={"created"})
+    request.session["user"] = user.session_payload()
 
 
 class DefaultAuthenticator(Authenticator):
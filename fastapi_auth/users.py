@@ -1,10 +1,12 @@
+from functools import cached_property
+
 from pydantic import BaseModel, Field
 
 
-from .roles import Role
-from .permissions import Permission
+from .roles import Role, ROLES_REGISTRY
+from .permissions import Permission, permission_bit
 
-from typeguard import typechecked
+from .typechecking import typechecked
 
 
 class User(BaseModel):
@@ -19,21 +21,46 @@ class User(BaseModel):
     # Is user anonymous
     is_anonymous: bool = True
 
-    # Roles of user
-    roles: list[Role] = []
+    # Roles of user (a tuple, so the cached role data below cannot go stale)
+    roles: tuple[Role, ...] = ()
 
     # Properties of user
     properties: dict = {}
 
+    def __setattr__(self, name, value) -> None:
+        if name == "roles":
+            value = tuple(value)
+        super().__setattr__(name, value)
+        if name == "roles":
+            self._drop_cached_role_data()
+
+    def __copy__(self) -> "User":
+        # model_copy(update=...) may replace the roles of the copy
+        copied = super().__copy__()
+        copied._drop_cached_role_data()
+        return copied
+
+    def __deepcopy__(self, memo: dict | None = None) -> "User":
+        copied = super().__deepcopy__(memo)
+        copied._drop_cached_role_data()
+        return copied
+
+    def _drop_cached_role_data(self) -> None:
+        """Drop the cached role_set, role_name_set and permission_mask."""
+        self.__dict__.pop("role_set", None)
+        self.__dict__.pop("role_name_set", None)
+        self.__dict__.pop("permission_mask", None)
+
     def __str__(self) -> str:
         """Return a string representation of the user."""
         self_str = super().__str__()
         return f"{self.__class__.__name__}({self_str})"
 
-    @typechecked
+    # no runtime type checks: has_role() and has_permission() are per-request
+    # hot paths (see AuthConfig.debug_typecheck for Protected)
     def has_role(self, role: Role) -> bool:
         """Check if the user has the required role."""
-        return role in self.roles
+        return role in self.role_set
 
     @typechecked
     def has_role_by_name(self, role_name: str) -> bool:
@@ -47,6 +74,16 @@ class User(BaseModel):
         """Return a list of role names."""
         return [role.name for role in self.roles]
 
+    @cached_property
+    def role_set(self) -> frozenset[Role]:
+        """Return the set of roles (computed once)."""
+        return frozenset(self.roles)
+
+    @cached_property
+    def role_name_set(self) -> frozenset[str]:
+        """Return the set of role names (computed once)."""
+        return frozenset(role.name for role in self.roles)
+
     def all_permissions(self) -> list[Permission]:
         """Return a list of all permissions."""
         permissions = []
@@ -59,13 +96,47 @@ class User(BaseModel):
         permissions = self.all_permissions()
         return [permission.name for permission in permissions]
 
-    @typechecked
+    @cached_property
+    def permission_mask(self) -> int:
+        """Return the union of the permission bitmasks of all roles (computed once)."""
+        mask = 0
+        for role in self.roles:
+            mask |= role.permission_mask
+        return mask
+
     def has_permission(self, permission: Permission) -> bool:
         """Check if the user has the required permission."""
-        for role in self.roles:
-            if permission in role.permissions:
-                return True
-        return False
+        return bool(self.permission_mask & permission_bit(permission))
+
+    def session_payload(self) -> dict:
+        """Return the compact representation of the user stored in the session.
+
+        Roles are stored by name only, see `from_session_payload()`.
+        """
+        return {
+            "name": self.name,
+            "description": self.description,
+            "is_anonymous": self.is_anonymous,
+            "roles": [role.name for role in self.roles],
+            "properties": self.properties,
+        }
+
+    @classmethod
+    def from_session_payload(cls, payload: dict) -> "User":
+        """Create a user from a session payload, taking roles from the ROLES_REGISTRY.
+
+        Roles that are not registered are dropped. Payloads of older versions,
+        holding complete roles, are still accepted; their roles are replaced by
+        equal registered ones.
+        """
+        role_names = payload.get("roles", [])
+        registered = ROLES_REGISTRY.as_dict()
+        if not all(isinstance(role_name, str) for role_name in role_names):
+            user = cls.model_validate(payload)
+            user.roles = [registered[role.name] if registered.get(role.name) == role else role for role in user.roles]
+            return user
+        roles = [registered[role_name] for role_name in role_names if role_name in registered]
+        return cls.model_validate({**payload, "roles": roles})
 
     @property
     def is_authenticated(self) -> bool:
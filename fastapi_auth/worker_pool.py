@@ -0,0 +1,88 @@
+"""Bounded worker pool for running blocking work (password hashing) off the event loop."""
+
+import asyncio
+import threading
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any
+
+from fastapi.exceptions import HTTPException
+from starlette import status
+
+from .auth_config import AUTH_SETTINGS
+from .typechecking import typechecked
+
+
+class WorkerPoolSaturated(HTTPException):
+    """Raised when all workers are busy and the wait queue is full."""
+
+    def __init__(self) -> None:
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Authentication service is busy. Please try again later.",
+        )
+
+
+class BoundedWorkerPool:
+    """A thread pool with a bounded number of pending jobs.
+
+    At most `max_workers` jobs run concurrently and at most `max_queue_size`
+    further jobs wait for a free worker. Submitting beyond that raises
+    `WorkerPoolSaturated` immediately instead of queueing without limit.
+    bcrypt and argon2 release the GIL while hashing, so threads give real parallelism.
+    """
+
+    @typechecked
+    def __init__(self, max_workers: int, max_queue_size: int) -> None:
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        if max_queue_size < 0:
+            raise ValueError("max_queue_size must not be negative")
+        self.max_workers = max_workers
+        self.max_queue_size = max_queue_size
+        self._slots = threading.BoundedSemaphore(max_workers + max_queue_size)
+        self._executor: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        """Return the underlying executor, creating it on first use."""
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix="fastapi-auth-worker",
+                    )
+        return self._executor
+
+    async def run(self, func: Callable, *args: Any, **kwargs: Any) -> Any:
+        """Run `func` in the pool and await its result.
+
+        The slot is released when the job finishes, not when the caller stops
+        waiting: a cancelled caller (e.g. an authenticator timeout) cannot stop
+        a running job, which keeps occupying its worker.
+        """
+        if not self._slots.acquire(blocking=False):
+            raise WorkerPoolSaturated()
+        try:
+            future = self.executor.submit(partial(func, *args, **kwargs))
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Shut down the executor. It is recreated on the next `run()`."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
+
+
+HASH_POOL = BoundedWorkerPool(
+    max_workers=AUTH_SETTINGS.hash_workers,
+    max_queue_size=AUTH_SETTINGS.hash_queue_size,
+)